@@ -0,0 +1,604 @@
+# encoding: utf-8
+import asyncio
+import json
+import time
+import urllib.parse
+from xhs_utils.data_util import filter_notes_since
+from xhs_utils.xhs_util import splice_str, generate_x_b3_traceid
+from xhs_utils.session_util import AsyncXHS_Session, NETWORK_ERRORS
+from xhs_utils.rate_limiter import RateLimiter
+from xhs_utils.rate_control import AdaptiveController, classify_response, OK, ERROR
+from xhs_utils.cookie_pool import CookiePool
+from xhs_utils.proxy_pool import ProxyPool
+from xhs_utils.response_cache import ResponseCache
+from loguru import logger
+
+SUB_COMMENT_API = "/api/sns/web/v2/comment/sub/page"
+
+"""
+    获小红书的api（asyncio 版本），接口和返回值与 XHS_Apis 保持一致
+    :param cookies_str: 你的cookies，也可以是 CookiePool
+"""
+class AsyncXHS_Apis():
+    def __init__(self, max_concurrency: int = 50, pool_size: int = 100, timeout=(5, 30), http2: bool = False, rate_limiter: RateLimiter = None,
+                 controller: AdaptiveController = None, cache: ResponseCache = None):
+        """
+            :param max_concurrency: 这个客户端同时在途的最大请求数
+            :param pool_size: 每个账号的连接池大小
+            :param timeout: 请求超时时间（秒），可以是 (连接超时, 读取超时)
+            :param http2: 是否使用 HTTP/2，需要安装 httpx[http2]
+            :param rate_limiter: 按账号和接口限速的令牌桶，默认使用 DEFAULT_RATES，可与 XHS_Apis 共享
+            :param controller: 按账号自适应调速和熔断的控制器，默认为 None 即不启用，可与 XHS_Apis 共享
+            :param cache: 接口响应缓存，命中时不用签名也不用发请求，默认为 None 即不缓存，可与 XHS_Apis 共享
+        """
+        self.base_url = "https://edith.xiaohongshu.com"
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.http2 = http2
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.controller = controller
+        self.cache = cache
+        self._sessions = {}
+        # 信号量要在事件循环中创建，第一次请求时再初始化
+        self._semaphore = None
+
+    def get_session(self, cookies_str: str):
+        session = self._sessions.get(cookies_str)
+        if session is None:
+            session = AsyncXHS_Session(cookies_str, self.pool_size, self.timeout, self.http2)
+            self._sessions[cookies_str] = session
+        return session
+
+    async def request(self, method: str, api: str, cookies_str, data='', proxies: dict = None):
+        """
+            使用账号的会话签名并发送请求，受 max_concurrency 限制
+            :param method: GET 或 POST
+            :param api: API 路径，GET 请求需要包含拼接好的参数
+            :param cookies_str: 你的cookies，也可以是 CookiePool，由账号池选择账号
+            :param data: POST 请求的数据
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 响应的 JSON 数据
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.cache is not None:
+            # 命中缓存时不用签名也不用发请求，也不占用账号和限速额度
+            res_json = self.cache.get(method, api, data)
+            if res_json is not None:
+                return res_json
+        pool, pool_account = None, None
+        if isinstance(cookies_str, CookiePool):
+            pool = cookies_str
+            pool_account = pool.acquire(self.controller)
+            cookies_str = pool_account.cookies_str
+        outcome = ERROR
+        try:
+            session = self.get_session(cookies_str)
+            account = session.a1
+            if self.controller is not None:
+                wait = self.controller.before_request(account)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            # 先限速再占用并发名额，等待令牌的请求不占名额
+            await self.rate_limiter.wait_async(api, account)
+            async with self._semaphore:
+                # 没有发出请求时（没有可用代理、签名失败等）不计入账号的调速和熔断
+                sent = False
+                try:
+                    # 先签名再占用代理，签名失败和代理无关
+                    headers, content = await session.sign(api, data)
+                    proxy, proxies_pool = None, proxies
+                    if isinstance(proxies_pool, ProxyPool):
+                        # 从代理池中选代理，开启 pin_accounts 时同一账号固定走同一个代理
+                        proxy = proxies_pool.acquire(account)
+                        proxies = proxy.proxies
+                    network_error = False
+                    start = time.time()
+                    sent = True
+                    try:
+                        response = await session.send(method, self.base_url + api, headers, content, proxies)
+                    except Exception as e:
+                        network_error = isinstance(e, NETWORK_ERRORS)
+                        outcome = classify_response(error=e)
+                        raise
+                    finally:
+                        # 代理只统计网络往返的耗时，只有连接失败和超时才算代理的失败
+                        if proxy is not None:
+                            proxies_pool.release(proxy, not network_error, time.time() - start)
+                    # 先按状态码分类，验证码页面、429 等的响应体可能不是 JSON
+                    try:
+                        res_json = response.json()
+                    except ValueError:
+                        res_json = None
+                    outcome = classify_response(res_json, response.status_code)
+                    if res_json is None:
+                        raise ValueError(f'响应不是 JSON，状态码: {response.status_code}')
+                finally:
+                    if self.controller is not None:
+                        if sent:
+                            self.controller.record(account, outcome)
+                        else:
+                            self.controller.cancel(account)
+            if self.cache is not None and outcome == OK:
+                self.cache.set(method, api, data, res_json)
+            return res_json
+        finally:
+            if pool is not None:
+                pool.release(pool_account, outcome)
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_user_info(self, user_id: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户的信息
+            :param user_id: 你想要获取的用户的id
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，用户信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = f"/api/sns/web/v1/user/otherinfo"
+            params = {
+                "target_user_id": user_id
+            }
+            splice_api = splice_str(api, params)
+            res_json = await self.request('GET', splice_api, cookies_str, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def get_user_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
+        """
+            获取用户指定位置的笔记
+            :param user_id: 你想要获取的用户的id
+            :param cursor: 你想要获取的笔记的cursor，用于分页
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param xsec_token: xsec_token 参数，默认为空字符串
+            :param xsec_source: xsec_source 参数，默认为空字符串
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，用户指定位置笔记信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = f"/api/sns/web/v1/user_posted"
+            params = {
+                "num": "30",
+                "cursor": cursor,
+                "user_id": user_id,
+                "image_formats": "jpg,webp,avif",
+                "xsec_token": xsec_token,
+                "xsec_source": xsec_source,
+            }
+            splice_api = splice_str(api, params)
+            res_json = await self.request('GET', splice_api, cookies_str, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def iter_user_notes(self, user_url: str, cookies_str: str, proxies: dict = None, limit: int = None, since: int = None):
+        """
+           逐页获取用户的笔记，每拿到一页就返回一页，不用等全部分页结束
+           :param user_url: 你想要获取的用户的 URL
+           :param cookies_str: 你的cookies，也可以是 CookiePool
+           :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+           :param limit: 最多获取的笔记数量，够了就不再请求下一页，默认为 None 即不限
+           :param since: 只获取这个时间（毫秒时间戳）之后发布的笔记，遇到更早的笔记就不再请求下一页，默认为 None 即不限
+           :return: 异步生成器，每次返回一页笔记信息的列表，请求失败时抛出异常
+        """
+        if limit is not None and limit <= 0:
+            return
+        cursor = ''
+        count = 0
+        urlParse = urllib.parse.urlparse(user_url)
+        user_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&')
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        while True:
+            success, msg, res_json = await self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
+            if not success:
+                raise Exception(msg)
+            notes = res_json["data"]["notes"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                break
+            done = len(notes) == 0 or not res_json["data"]["has_more"]
+            if since is not None:
+                notes, expired = filter_notes_since(notes, since)
+                done = done or expired
+            if limit is not None:
+                notes = notes[:limit - count]
+                count += len(notes)
+                done = done or count >= limit
+            yield notes
+            if done:
+                break
+
+    async def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None, limit: int = None, since: int = None):
+        """
+           获取用户所有笔记
+           :param user_url: 你想要获取的用户的 URL
+           :param cookies_str: 你的cookies，也可以是 CookiePool
+           :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+           :param limit: 最多获取的笔记数量，默认为 None 即不限
+           :param since: 只获取这个时间（毫秒时间戳）之后发布的笔记，默认为 None 即不限
+           :return: 成功状态，消息，用户所有笔记信息的列表
+        """
+        note_list = []
+        try:
+            async for notes in self.iter_user_notes(user_url, cookies_str, proxies, limit, since):
+                note_list.extend(notes)
+            success, msg = True, '成功'
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_list
+
+    async def get_note_info(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的详细信息
+            :param url: 你想要获取的笔记的 URL
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，笔记详细信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            urlParse = urllib.parse.urlparse(url)
+            note_id = urlParse.path.split("/")[-1]
+            kvs = urlParse.query.split('&')
+            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+            api = f"/api/sns/web/v1/feed"
+            data = {
+                "source_note_id": note_id,
+                "image_formats": [
+                    "jpg",
+                    "webp",
+                    "avif"
+                ],
+                "extra": {
+                    "need_body_topic": "1"
+                },
+                "xsec_source": kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search",
+                "xsec_token": kvDist['xsec_token']
+            }
+            res_json = await self.request('POST', api, cookies_str, data, proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def get_search_keyword(self, word: str, cookies_str: str, proxies: dict = None):
+        """
+            获取搜索关键词相关信息
+            :param word: 你的关键词
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，搜索关键词相关信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = "/api/sns/web/v1/search/recommend"
+            params = {
+                "keyword": urllib.parse.quote(word)
+            }
+            splice_api = splice_str(api, params)
+            res_json = await self.request('GET', splice_api, cookies_str, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def search_note(self, query: str, cookies_str: str, page=1, sort="general", note_type=0, proxies: dict = None):
+        """
+            获取搜索笔记的结果
+            :param query: 搜索的关键词
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param page: 搜索的页数，默认为 1
+            :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
+            :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，搜索笔记结果的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = "/api/sns/web/v1/search/notes"
+            data = {
+                "keyword": query,
+                "page": page,
+                "page_size": 20,
+                "search_id": generate_x_b3_traceid(21),
+                "sort": sort,
+                "note_type": note_type,
+                "ext_flags": [],
+                "image_formats": [
+                    "jpg",
+                    "webp",
+                    "avif"
+                ]
+            }
+            res_json = await self.request('POST', api, cookies_str, data, proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def iter_search_notes(self, query: str, require_num: int, cookies_str: str, sort="general", note_type=0, proxies: dict = None):
+        """
+            逐页搜索笔记，每拿到一页就返回一页，总数达到 require_num 时停止
+            :param query: 搜索的关键词
+            :param require_num: 搜索的数量
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
+            :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 异步生成器，每次返回一页搜索结果的列表，请求失败时抛出异常
+        """
+        page = 1
+        count = 0
+        while count < require_num:
+            success, msg, res_json = await self.search_note(query, cookies_str, page, sort, note_type, proxies)
+            if not success:
+                raise Exception(msg)
+            if "items" not in res_json["data"]:
+                break
+            notes = res_json["data"]["items"][:require_num - count]
+            count += len(notes)
+            yield notes
+            page += 1
+            if not res_json["data"]["has_more"]:
+                break
+
+    async def search_some_note(self, query: str, require_num: int, cookies_str: str, sort="general", note_type=0, proxies: dict = None):
+        """
+            指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
+            :param query: 搜索的关键词
+            :param require_num: 搜索的数量
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
+            :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，搜索笔记结果的列表
+        """
+        note_list = []
+        try:
+            async for notes in self.iter_search_notes(query, require_num, cookies_str, sort, note_type, proxies):
+                note_list.extend(notes)
+            success, msg = True, '成功'
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_list
+
+    async def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记一级评论
+            :param note_id: 笔记的 id
+            :param cursor: 指定位置的评论的 cursor，用于分页
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，指定位置笔记一级评论信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = "/api/sns/web/v2/comment/page"
+            params = {
+                "note_id": note_id,
+                "cursor": cursor,
+                "top_comment_id": "",
+                "image_formats": "jpg,webp,avif",
+                "xsec_token": xsec_token
+            }
+            splice_api = splice_str(api, params)
+            res_json = await self.request('GET', splice_api, cookies_str, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def iter_note_out_comments(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None,
+                               limit: int = None, since: int = None):
+        """
+            逐页获取笔记的一级评论，每拿到一页就返回一页
+            :param note_id: 笔记的 id
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多获取的评论数量，够了就不再请求下一页，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的评论，默认为 None 即不限
+            :return: 异步生成器，每次返回一页一级评论信息的列表，请求失败时抛出异常
+        """
+        if limit is not None and limit <= 0:
+            return
+        cursor = ''
+        count = 0
+        kept = 0
+        while True:
+            success, msg, res_json = await self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
+            if not success:
+                raise Exception(msg)
+            comments = res_json["data"]["comments"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                break
+            count += len(comments)
+            done = count == 0 or not res_json["data"]["has_more"]
+            if since is not None:
+                comments = [comment for comment in comments if comment['create_time'] >= since]
+            if limit is not None:
+                comments = comments[:limit - kept]
+                done = done or kept + len(comments) >= limit
+            kept += len(comments)
+            yield comments
+            if done:
+                break
+
+    async def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None,
+                                 limit: int = None, since: int = None):
+        """
+            获取笔记的全部一级评论
+            :param note_id: 笔记的 id
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多获取的评论数量，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的评论，默认为 None 即不限
+            :return: 成功状态，消息，笔记全部一级评论信息的列表
+        """
+        note_out_comment_list = []
+        try:
+            async for comments in self.iter_note_out_comments(note_id, xsec_token, cookies_str, proxies, limit, since):
+                note_out_comment_list.extend(comments)
+            success, msg = True, '成功'
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_out_comment_list
+
+    async def get_note_inner_comment(self, comment: dict, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记二级评论
+            :param comment: 笔记的一级评论
+            :param cursor: 指定位置的评论的 cursor，用于分页
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，指定位置笔记二级评论信息的 JSON 数据
+        """
+        res_json = None
+        try:
+            api = SUB_COMMENT_API
+            params = {
+                "note_id": comment['note_id'],
+                "root_comment_id": comment['id'],
+                "num": "10",
+                "cursor": cursor,
+                "image_formats": "jpg,webp,avif",
+                "top_comment_id": '',
+                "xsec_token": xsec_token
+            }
+            splice_api = splice_str(api, params)
+            res_json = await self.request('GET', splice_api, cookies_str, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None,
+                                   limit: int = None, since: int = None):
+        """
+            获取笔记的全部二级评论
+            :param comment: 笔记的一级评论
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多保留的二级评论数量（包括一级评论里已经带的），够了就不再请求下一页，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的二级评论，默认为 None 即不限
+            :return: 成功状态，消息，包含全部二级评论信息的一级评论字典
+        """
+        try:
+            if since is not None:
+                comment['sub_comments'] = [sub for sub in comment['sub_comments'] if sub['create_time'] >= since]
+            if limit is not None and len(comment['sub_comments']) >= limit:
+                comment['sub_comments'] = comment['sub_comments'][:limit]
+                return True, 'success', comment
+            if not comment['sub_comment_has_more']:
+                return True, 'success', comment
+            cursor = comment['sub_comment_cursor']
+            inner_comment_list = []
+            while True:
+                success, msg, res_json = await self.get_note_inner_comment(comment, cursor, xsec_token, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                comments = res_json["data"]["comments"]
+                if 'cursor' in res_json["data"]:
+                    cursor = str(res_json["data"]["cursor"])
+                else:
+                    break
+                if since is not None:
+                    comments = [sub for sub in comments if sub['create_time'] >= since]
+                inner_comment_list.extend(comments)
+                if limit is not None and len(comment['sub_comments']) + len(inner_comment_list) >= limit:
+                    break
+                if not res_json["data"]["has_more"]:
+                    break
+            comment['sub_comments'].extend(inner_comment_list)
+            if limit is not None:
+                comment['sub_comments'] = comment['sub_comments'][:limit]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, comment
+
+    async def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取一篇文章的所有评论，各一级评论的二级评论并发获取，并发数受 max_concurrency 限制，
+            请求节奏由限速器控制，二级评论接口没有限速时逐条获取
+            :param url: 你想要获取的笔记的 URL
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 成功状态，消息，文章所有评论信息的列表
+        """
+        out_comment_list = []
+        try:
+            urlParse = urllib.parse.urlparse(url)
+            note_id = urlParse.path.split("/")[-1]
+            kvs = urlParse.query.split('&')
+            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+            success, msg, out_comment_list = await self.get_note_all_out_comment(note_id, kvDist['xsec_token'], cookies_str, proxies)
+            if not success:
+                raise Exception(msg)
+            if self.rate_limiter.is_limited(SUB_COMMENT_API):
+                results = await asyncio.gather(*[
+                    self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
+                    for comment in out_comment_list
+                ])
+            else:
+                # 二级评论接口不限速时，并发展开会把同一个账号的请求一下子全部发出去
+                logger.warning('二级评论接口没有限速，改为逐条展开')
+                results = []
+                for comment in out_comment_list:
+                    results.append(await self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies))
+                    if not results[-1][0]:
+                        break
+            for success, msg, new_comment in results:
+                if not success:
+                    raise Exception(msg)
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, out_comment_list
+
+
+if __name__ == '__main__':
+    async def main():
+        async with AsyncXHS_Apis() as xhs_apis:
+            cookies_str = r''
+            note_url = r'https://www.xiaohongshu.com/explore/678ddb44000000001b00a0bb?xsec_token=ABOm-mzcaX0ghyz9OA_YNAjYJ8cLG7ePBl44ZxirCwWEQ='
+            success, msg, note_all_comment = await xhs_apis.get_note_all_comment(note_url, cookies_str)
+            logger.info(f'获取笔记评论结果 {json.dumps(note_all_comment, ensure_ascii=False)}: {success}, msg: {msg}')
+    asyncio.run(main())
@@ -1,27 +1,152 @@
 # encoding: utf-8
 import json
+import threading
+import time
 import urllib
-import requests
-from xhs_utils.xhs_util import splice_str, generate_request_params, generate_x_b3_traceid
+from concurrent.futures import ThreadPoolExecutor
+from xhs_utils.data_util import filter_notes_since
+from xhs_utils.xhs_util import splice_str, generate_x_b3_traceid
+from xhs_utils.session_util import XHS_Session, NETWORK_ERRORS
+from xhs_utils.rate_limiter import RateLimiter
+from xhs_utils.rate_control import AdaptiveController, classify_response, OK, ERROR
+from xhs_utils.cookie_pool import CookiePool
+from xhs_utils.proxy_pool import ProxyPool
+from xhs_utils.response_cache import ResponseCache
 from loguru import logger
-import random
-import time
+
+SUB_COMMENT_API = "/api/sns/web/v2/comment/sub/page"
 
 """
     获小红书的api
-    :param cookies_str: 你的cookies
+    :param cookies_str: 你的cookies，也可以是 CookiePool
 """
 class XHS_Apis():
-    def __init__(self):
+    def __init__(self, pool_size: int = 10, timeout=(5, 30), http2: bool = False, rate_limiter: RateLimiter = None,
+                 controller: AdaptiveController = None, cache: ResponseCache = None):
+        """
+            :param pool_size: 每个账号的连接池大小
+            :param timeout: 请求超时时间（秒），可以是 (连接超时, 读取超时)
+            :param http2: 是否使用 HTTP/2，需要安装 httpx[http2]
+            :param rate_limiter: 按账号和接口限速的令牌桶，默认使用 DEFAULT_RATES，可在多个实例间共享
+            :param controller: 按账号自适应调速和熔断的控制器，默认为 None 即不启用
+            :param cache: 接口响应缓存，命中时不用签名也不用发请求，默认为 None 即不缓存
+        """
         # 初始化基础 URL，这是小红书 API 请求的基础地址
         self.base_url = "https://edith.xiaohongshu.com"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.http2 = http2
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.controller = controller
+        self.cache = cache
+        # 每个账号一个会话，复用解析好的 cookies、固定请求头和 keep-alive 连接
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def get_session(self, cookies_str: str):
+        """
+            获取账号对应的会话，不存在时创建
+            :param cookies_str: 你的cookies
+            :return: XHS_Session
+        """
+        session = self._sessions.get(cookies_str)
+        if session is None:
+            with self._sessions_lock:
+                session = self._sessions.get(cookies_str)
+                if session is None:
+                    session = XHS_Session(cookies_str, self.pool_size, self.timeout, self.http2)
+                    self._sessions[cookies_str] = session
+        return session
+
+    def request(self, method: str, api: str, cookies_str, data='', proxies: dict = None):
+        """
+            使用账号的会话签名并发送请求
+            :param method: GET 或 POST
+            :param api: API 路径，GET 请求需要包含拼接好的参数
+            :param cookies_str: 你的cookies，也可以是 CookiePool，由账号池选择账号
+            :param data: POST 请求的数据
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 响应的 JSON 数据
+        """
+        if self.cache is not None:
+            # 命中缓存时不用签名也不用发请求，也不占用账号和限速额度
+            res_json = self.cache.get(method, api, data)
+            if res_json is not None:
+                return res_json
+        pool, pool_account = None, None
+        if isinstance(cookies_str, CookiePool):
+            pool = cookies_str
+            pool_account = pool.acquire(self.controller)
+            cookies_str = pool_account.cookies_str
+        # 没有拿到响应时（熔断、签名失败等）不计入账号健康度
+        outcome = ERROR
+        try:
+            session = self.get_session(cookies_str)
+            account = session.a1
+            if self.controller is not None:
+                # 账号熔断冷却中时直接抛出 CircuitOpenError，不再浪费请求
+                wait = self.controller.before_request(account)
+                if wait > 0:
+                    time.sleep(wait)
+            # 按账号和接口限速，等待到允许发送为止
+            self.rate_limiter.wait(api, account)
+            # 没有发出请求时（没有可用代理、签名失败等）不计入账号的调速和熔断
+            sent = False
+            try:
+                # 先签名再占用代理，签名失败和代理无关
+                headers, content = session.sign(api, data)
+                proxy, proxies_pool = None, proxies
+                if isinstance(proxies_pool, ProxyPool):
+                    # 从代理池中选代理，开启 pin_accounts 时同一账号固定走同一个代理
+                    proxy = proxies_pool.acquire(account)
+                    proxies = proxy.proxies
+                network_error = False
+                start = time.time()
+                sent = True
+                try:
+                    response = session.send(method, self.base_url + api, headers, content, proxies)
+                except Exception as e:
+                    network_error = isinstance(e, NETWORK_ERRORS)
+                    outcome = classify_response(error=e)
+                    raise
+                finally:
+                    # 代理只统计网络往返的耗时，只有连接失败和超时才算代理的失败
+                    if proxy is not None:
+                        proxies_pool.release(proxy, not network_error, time.time() - start)
+                # 先按状态码分类，验证码页面、429 等的响应体可能不是 JSON
+                try:
+                    res_json = response.json()
+                except ValueError:
+                    res_json = None
+                outcome = classify_response(res_json, response.status_code)
+                if res_json is None:
+                    raise ValueError(f'响应不是 JSON，状态码: {response.status_code}')
+            finally:
+                if self.controller is not None:
+                    if sent:
+                        self.controller.record(account, outcome)
+                    else:
+                        self.controller.cancel(account)
+            if self.cache is not None and outcome == OK:
+                self.cache.set(method, api, data, res_json)
+            return res_json
+        finally:
+            if pool is not None:
+                pool.release(pool_account, outcome)
+
+    def close(self):
+        # 关闭所有账号的连接
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
 
     def get_user_info(self, user_id: str, cookies_str: str, proxies: dict = None):
         """
             获取用户的信息
             :param user_id: 你想要获取的用户的id
-            :param cookies_str: 你的cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，用户信息的 JSON 数据
         """
         res_json = None
@@ -34,12 +159,8 @@ class XHS_Apis():
             }
             # 拼接 API 路径和参数
             splice_api = splice_str(api, params)
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, splice_api)
-            # 发送 GET 请求
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 GET 请求
+            res_json = self.request('GET', splice_api, cookies_str, proxies=proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -53,10 +174,10 @@ class XHS_Apis():
             获取用户指定位置的笔记
             :param user_id: 你想要获取的用户的id
             :param cursor: 你想要获取的笔记的cursor，用于分页
-            :param cookies_str: 你的cookies
+            :param cookies_str: 你的cookies，也可以是 CookiePool
             :param xsec_token: xsec_token 参数，默认为空字符串
             :param xsec_source: xsec_source 参数，默认为空字符串
-            :param proxies: 代理设置，默认为 None
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，用户指定位置笔记信息的 JSON 数据
         """
         res_json = None
@@ -74,12 +195,8 @@ class XHS_Apis():
             }
             # 拼接 API 路径和参数
             splice_api = splice_str(api, params)
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, splice_api)
-            # 发送 GET 请求
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 GET 请求
+            res_json = self.request('GET', splice_api, cookies_str, proxies=proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -88,47 +205,77 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
+    def iter_user_notes(self, user_url: str, cookies_str: str, proxies: dict = None, limit: int = None, since: int = None):
+        """
+           逐页获取用户的笔记，每拿到一页就返回一页，不用等全部分页结束
+           :param user_url: 你想要获取的用户的 URL
+           :param cookies_str: 你的cookies，也可以是 CookiePool
+           :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+           :param limit: 最多获取的笔记数量，够了就不再请求下一页，默认为 None 即不限
+           :param since: 只获取这个时间（毫秒时间戳）之后发布的笔记，遇到更早的笔记就不再请求下一页，默认为 None 即不限
+           :return: 生成器，每次返回一页笔记信息的列表，请求失败时抛出异常
+        """
+        if limit is not None and limit <= 0:
+            return
+        cursor = ''
+        count = 0
+        # 解析用户 URL
+        urlParse = urllib.parse.urlparse(user_url)
+        # 提取用户 ID
+        user_id = urlParse.path.split("/")[-1]
+        # 解析 URL 中的查询参数
+        kvs = urlParse.query.split('&')
+        # 将查询参数转换为字典
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+        # 提取 xsec_token 参数，若不存在则为空字符串
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        # 提取 xsec_source 参数，若不存在则为 'pc_search'
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        while True:
+            # 调用 get_user_note_info 方法获取用户指定位置的笔记信息
+            success, msg, res_json = self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
+            if not success:
+                # 若请求失败，抛出异常
+                raise Exception(msg)
+            # 提取笔记信息
+            notes = res_json["data"]["notes"]
+            if 'cursor' in res_json["data"]:
+                # 更新 cursor 用于下一页请求
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                break
+            # 若没有更多笔记，这一页之后退出循环
+            done = len(notes) == 0 or not res_json["data"]["has_more"]
+            if since is not None:
+                # 笔记按发布时间倒序，出现早于 since 的笔记后不用再翻页
+                notes, expired = filter_notes_since(notes, since)
+                done = done or expired
+            if limit is not None:
+                # 截掉超过所需数量的部分，数量够了就不用再翻页
+                notes = notes[:limit - count]
+                count += len(notes)
+                done = done or count >= limit
+            # 返回这一页的笔记信息
+            yield notes
+            if done:
+                break
+
+    def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None, limit: int = None, since: int = None):
         """
            获取用户所有笔记
            :param user_url: 你想要获取的用户的 URL
-           :param cookies_str: 你的cookies
-           :param proxies: 代理设置，默认为 None
+           :param cookies_str: 你的cookies，也可以是 CookiePool
+           :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+           :param limit: 最多获取的笔记数量，默认为 None 即不限
+           :param since: 只获取这个时间（毫秒时间戳）之后发布的笔记，默认为 None 即不限
            :return: 成功状态，消息，用户所有笔记信息的列表
         """
-        cursor = ''
         note_list = []
         try:
-            # 解析用户 URL
-            urlParse = urllib.parse.urlparse(user_url)
-            # 提取用户 ID
-            user_id = urlParse.path.split("/")[-1]
-            # 解析 URL 中的查询参数
-            kvs = urlParse.query.split('&')
-            # 将查询参数转换为字典
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            # 提取 xsec_token 参数，若不存在则为空字符串
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            # 提取 xsec_source 参数，若不存在则为 'pc_search'
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
-            while True:
-                # 调用 get_user_note_info 方法获取用户指定位置的笔记信息
-                success, msg, res_json = self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
-                if not success:
-                    # 若请求失败，抛出异常
-                    raise Exception(msg)
-                # 提取笔记信息
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    # 更新 cursor 用于下一页请求
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
+            for notes in self.iter_user_notes(user_url, cookies_str, proxies, limit, since):
                 # 将笔记信息添加到列表中
                 note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    # 若没有更多笔记，退出循环
-                    break
+            success, msg = True, '成功'
         except Exception as e:
             # 若出现异常，设置成功状态为 False，消息为异常信息
             success = False
@@ -139,13 +286,12 @@ class XHS_Apis():
         """
             获取笔记的详细信息
             :param url: 你想要获取的笔记的 URL
-            :param cookies_str: 你的cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，笔记详细信息的 JSON 数据
         """
         res_json = None
         try:
-            time.sleep(random.randint(5, 10))
             # 解析笔记 URL
             urlParse = urllib.parse.urlparse(url)
             # 提取笔记 ID
@@ -170,12 +316,8 @@ class XHS_Apis():
                 "xsec_source": kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search",
                 "xsec_token": kvDist['xsec_token']
             }
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, api, data)
-            # 发送 POST 请求
-            response = requests.post(self.base_url + api, headers=headers, data=data, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 POST 请求，数据以 UTF-8 编码
+            res_json = self.request('POST', api, cookies_str, data, proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -188,8 +330,8 @@ class XHS_Apis():
         """
             获取搜索关键词相关信息
             :param word: 你的关键词
-            :param cookies_str: 你的cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，搜索关键词相关信息的 JSON 数据
         """
         res_json = None
@@ -202,12 +344,8 @@ class XHS_Apis():
             }
             # 拼接 API 路径和参数
             splice_api = splice_str(api, params)
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, splice_api)
-            # 发送 GET 请求
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 GET 请求
+            res_json = self.request('GET', splice_api, cookies_str, proxies=proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -220,11 +358,11 @@ class XHS_Apis():
         """
             获取搜索笔记的结果
             :param query: 搜索的关键词
-            :param cookies_str: 你的 cookies
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
             :param page: 搜索的页数，默认为 1
             :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
             :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
-            :param proxies: 代理设置，默认为 None
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，搜索笔记结果的 JSON 数据
         """
         res_json = None
@@ -246,12 +384,8 @@ class XHS_Apis():
                     "avif"
                 ]
             }
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, api, data)
-            # 发送 POST 请求，对数据进行 UTF-8 编码
-            response = requests.post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 POST 请求，数据以 UTF-8 编码
+            res_json = self.request('POST', api, cookies_str, data, proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -260,45 +394,59 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_search_notes(self, query: str, require_num: int, cookies_str: str, sort="general", note_type=0, proxies: dict = None):
+        """
+            逐页搜索笔记，每拿到一页就返回一页，总数达到 require_num 时停止
+            :param query: 搜索的关键词
+            :param require_num: 搜索的数量
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
+            :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 生成器，每次返回一页搜索结果的列表，请求失败时抛出异常
+        """
+        page = 1
+        count = 0
+        while count < require_num:
+            # 调用 search_note 方法进行笔记搜索
+            success, msg, res_json = self.search_note(query, cookies_str, page, sort, note_type, proxies)
+            if not success:
+                # 若请求失败，抛出异常
+                raise Exception(msg)
+            if "items" not in res_json["data"]:
+                # 若没有搜索结果，退出循环
+                break
+            # 提取搜索结果中的笔记信息，超过所需数量的部分截掉
+            notes = res_json["data"]["items"][:require_num - count]
+            count += len(notes)
+            yield notes
+            # 增加页码
+            page += 1
+            if not res_json["data"]["has_more"]:
+                # 若没有更多结果，退出循环
+                break
+
     def search_some_note(self, query: str, require_num: int, cookies_str: str, sort="general", note_type=0, proxies: dict = None):
         """
             指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
             :param query: 搜索的关键词
             :param require_num: 搜索的数量
-            :param cookies_str: 你的 cookies
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
             :param sort: 排序方式，general:综合排序, time_descending:时间排序, popularity_descending:热度排序，默认为 general
             :param note_type: 笔记类型，0:全部, 1:视频, 2:图文，默认为 0
-            :param proxies: 代理设置，默认为 None
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，搜索笔记结果的列表
         """
-        page = 1
         note_list = []
         try:
-            while True:
-                # 调用 search_note 方法进行笔记搜索
-                success, msg, res_json = self.search_note(query, cookies_str, page, sort, note_type, proxies)
-                if not success:
-                    # 若请求失败，抛出异常
-                    raise Exception(msg)
-                if "items" not in res_json["data"]:
-                    # 若没有搜索结果，退出循环
-                    break
-                # 提取搜索结果中的笔记信息
-                notes = res_json["data"]["items"]
+            for notes in self.iter_search_notes(query, require_num, cookies_str, sort, note_type, proxies):
                 # 将笔记信息添加到列表中
                 note_list.extend(notes)
-                # 增加页码
-                page += 1
-                if len(note_list) >= require_num or not res_json["data"]["has_more"]:
-                    # 若达到所需数量或没有更多结果，退出循环
-                    break
+            success, msg = True, '成功'
         except Exception as e:
             # 若出现异常，设置成功状态为 False，消息为异常信息
             success = False
             msg = str(e)
-        if len(note_list) > require_num:
-            # 若笔记数量超过所需数量，截取前 require_num 条
-            note_list = note_list[:require_num]
         return success, msg, note_list
 
     def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
@@ -307,8 +455,8 @@ class XHS_Apis():
             :param note_id: 笔记的 id
             :param cursor: 指定位置的评论的 cursor，用于分页
             :param xsec_token: xsec_token 参数
-            :param cookies_str: 你的 cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，指定位置笔记一级评论信息的 JSON 数据
         """
         res_json = None
@@ -325,12 +473,8 @@ class XHS_Apis():
             }
             # 拼接 API 路径和参数
             splice_api = splice_str(api, params)
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, splice_api)
-            # 发送 GET 请求
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 GET 请求
+            res_json = self.request('GET', splice_api, cookies_str, proxies=proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -339,36 +483,69 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+    def iter_note_out_comments(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None,
+                               limit: int = None, since: int = None):
+        """
+            逐页获取笔记的一级评论，每拿到一页就返回一页
+            :param note_id: 笔记的 id
+            :param xsec_token: xsec_token 参数
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多获取的评论数量，够了就不再请求下一页，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的评论，默认为 None 即不限
+            :return: 生成器，每次返回一页一级评论信息的列表，请求失败时抛出异常
+        """
+        if limit is not None and limit <= 0:
+            return
+        cursor = ''
+        count = 0
+        kept = 0
+        while True:
+            # 调用 get_note_out_comment 方法获取指定位置的笔记一级评论信息
+            success, msg, res_json = self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
+            if not success:
+                # 若请求失败，抛出异常
+                raise Exception(msg)
+            # 提取评论信息
+            comments = res_json["data"]["comments"]
+            if 'cursor' in res_json["data"]:
+                # 更新 cursor 用于下一页请求
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                break
+            count += len(comments)
+            # 若没有更多评论，这一页之后退出循环
+            done = count == 0 or not res_json["data"]["has_more"]
+            if since is not None:
+                # 评论不是按时间排序的，只能逐条过滤
+                comments = [comment for comment in comments if comment['create_time'] >= since]
+            if limit is not None:
+                # 截掉超过所需数量的部分，数量够了就不用再翻页
+                comments = comments[:limit - kept]
+                done = done or kept + len(comments) >= limit
+            kept += len(comments)
+            yield comments
+            if done:
+                break
+
+    def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None,
+                                 limit: int = None, since: int = None):
         """
             获取笔记的全部一级评论
             :param note_id: 笔记的 id
             :param xsec_token: xsec_token 参数
-            :param cookies_str: 你的 cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多获取的评论数量，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的评论，默认为 None 即不限
             :return: 成功状态，消息，笔记全部一级评论信息的列表
         """
-        cursor = ''
         note_out_comment_list = []
         try:
-            while True:
-                # 调用 get_note_out_comment 方法获取指定位置的笔记一级评论信息
-                success, msg, res_json = self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
-                if not success:
-                    # 若请求失败，抛出异常
-                    raise Exception(msg)
-                # 提取评论信息
-                comments = res_json["data"]["comments"]
-                if 'cursor' in res_json["data"]:
-                    # 更新 cursor 用于下一页请求
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
+            for comments in self.iter_note_out_comments(note_id, xsec_token, cookies_str, proxies, limit, since):
                 # 将评论信息添加到列表中
                 note_out_comment_list.extend(comments)
-                if len(note_out_comment_list) == 0 or not res_json["data"]["has_more"]:
-                    # 若没有更多评论，退出循环
-                    break
+            success, msg = True, '成功'
         except Exception as e:
             # 若出现异常，设置成功状态为 False，消息为异常信息
             success = False
@@ -381,14 +558,14 @@ class XHS_Apis():
             :param comment: 笔记的一级评论
             :param cursor: 指定位置的评论的 cursor，用于分页
             :param xsec_token: xsec_token 参数
-            :param cookies_str: 你的 cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
             :return: 成功状态，消息，指定位置笔记二级评论信息的 JSON 数据
         """
         res_json = None
         try:
             # 定义获取笔记二级评论的 API 路径
-            api = "/api/sns/web/v2/comment/sub/page"
+            api = SUB_COMMENT_API
             # 构建请求参数
             params = {
                 "note_id": comment['note_id'],
@@ -401,12 +578,8 @@ class XHS_Apis():
             }
             # 拼接 API 路径和参数
             splice_api = splice_str(api, params)
-            # 生成请求所需的头部、cookies 和数据
-            headers, cookies, data = generate_request_params(cookies_str, splice_api)
-            # 发送 GET 请求
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
-            # 将响应内容解析为 JSON
-            res_json = response.json()
+            # 签名并发送 GET 请求
+            res_json = self.request('GET', splice_api, cookies_str, proxies=proxies)
             # 提取成功状态和消息
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -415,16 +588,26 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None):
+    def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None,
+                                   limit: int = None, since: int = None):
         """
             获取笔记的全部二级评论
             :param comment: 笔记的一级评论
             :param xsec_token: xsec_token 参数
-            :param cookies_str: 你的 cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param limit: 最多保留的二级评论数量（包括一级评论里已经带的），够了就不再请求下一页，默认为 None 即不限
+            :param since: 只保留这个时间（毫秒时间戳）之后发表的二级评论，默认为 None 即不限
             :return: 成功状态，消息，包含全部二级评论信息的一级评论字典
         """
         try:
+            if since is not None:
+                # 一级评论里已经带的二级评论也按时间过滤
+                comment['sub_comments'] = [sub for sub in comment['sub_comments'] if sub['create_time'] >= since]
+            if limit is not None and len(comment['sub_comments']) >= limit:
+                # 已经带的二级评论够数量了，不用再请求
+                comment['sub_comments'] = comment['sub_comments'][:limit]
+                return True, 'success', comment
             if not comment['sub_comment_has_more']:
                 # 若没有更多二级评论，直接返回成功信息
                 return True, 'success', comment
@@ -444,25 +627,36 @@ class XHS_Apis():
                     cursor = str(res_json["data"]["cursor"])
                 else:
                     break
+                if since is not None:
+                    # 只保留 since 之后发表的评论
+                    comments = [sub for sub in comments if sub['create_time'] >= since]
                 # 将评论信息添加到列表中
                 inner_comment_list.extend(comments)
+                if limit is not None and len(comment['sub_comments']) + len(inner_comment_list) >= limit:
+                    # 数量够了，不用再翻页
+                    break
                 if not res_json["data"]["has_more"]:
                     # 若没有更多评论，退出循环
                     break
             # 将二级评论信息添加到一级评论的 sub_comments 列表中
             comment['sub_comments'].extend(inner_comment_list)
+            if limit is not None:
+                # 截掉超过所需数量的部分
+                comment['sub_comments'] = comment['sub_comments'][:limit]
         except Exception as e:
             # 若出现异常，设置成功状态为 False，消息为异常信息
             success = False
             msg = str(e)
         return success, msg, comment
 
-    def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
+    def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None, max_workers: int = 1):
         """
             获取一篇文章的所有评论
             :param url: 你想要获取的笔记的 URL
-            :param cookies_str: 你的 cookies
-            :param proxies: 代理设置，默认为 None
+            :param cookies_str: 你的 cookies，也可以是 CookiePool
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param max_workers: 同时展开二级评论的一级评论数量，大于 1 时并发翻页，请求节奏仍由共用的限速器控制，
+                                二级评论接口没有限速时逐条展开，默认为 1 即逐条展开
             :return: 成功状态，消息，文章所有评论信息的列表
         """
         out_comment_list = []
@@ -480,12 +674,33 @@ class XHS_Apis():
             if not success:
                 # 若请求失败，抛出异常
                 raise Exception(msg)
-            for comment in out_comment_list:
-                # 调用 get_note_all_inner_comment 方法获取每条一级评论的全部二级评论信息
-                success, msg, new_comment = self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
-                if not success:
-                    # 若请求失败，抛出异常
-                    raise Exception(msg)
+            if max_workers > 1 and not self.rate_limiter.is_limited(SUB_COMMENT_API):
+                # 二级评论接口不限速时，并发展开会把同一个账号的请求一下子全部发出去
+                logger.warning('二级评论接口没有限速，改为逐条展开')
+                max_workers = 1
+            if max_workers > 1:
+                # 各条一级评论的二级评论分页互不依赖，并发展开，结果直接写入各自的 sub_comments
+                # 没有更多二级评论的不用提交
+                comments = [comment for comment in out_comment_list if comment['sub_comment_has_more']]
+                with ThreadPoolExecutor(max_workers=min(max_workers, max(len(comments), 1))) as executor:
+                    futures = [
+                        executor.submit(self.get_note_all_inner_comment, comment, kvDist['xsec_token'], cookies_str, proxies)
+                        for comment in comments
+                    ]
+                    for future in futures:
+                        success, msg, new_comment = future.result()
+                        if not success:
+                            # 若请求失败，取消还没开始的任务并抛出异常
+                            for pending in futures:
+                                pending.cancel()
+                            raise Exception(msg)
+            else:
+                for comment in out_comment_list:
+                    # 调用 get_note_all_inner_comment 方法获取每条一级评论的全部二级评论信息
+                    success, msg, new_comment = self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
+                    if not success:
+                        # 若请求失败，抛出异常
+                        raise Exception(msg)
         except Exception as e:
             # 若出现异常，设置成功状态为 False，消息为异常信息
             success = False
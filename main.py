@@ -1,22 +1,55 @@
 import os
 from loguru import logger
 from apis.pc_apis import XHS_Apis
+from xhs_utils.rate_limiter import RateLimiter
+from xhs_utils.rate_control import AdaptiveController, classify_response, ERROR
+from xhs_utils.cookie_pool import CookiePool
 from xhs_utils.common_utils import init
-from xhs_utils.data_util import handle_note_info, download_note, save_to_xlsx
+from xhs_utils.pipeline import Pipeline
+from xhs_utils.download_util import MediaDownloader
+from xhs_utils.media_store import MediaStore
+from xhs_utils.response_cache import ResponseCache
+from xhs_utils.watermark import WatermarkStore
+from xhs_utils.storage import SqliteStorage
+from xhs_utils.records import NoteRecord
+from xhs_utils.journal import JobJournal, JOB_NOTES, JOB_USER, JOB_SEARCH, get_note_id
+from xhs_utils.data_util import handle_note_info, download_note
+from xhs_utils.export_util import EXPORTERS, parse_save_choice, get_exporters
 import random
 import time
 
 
 class Data_Spider():
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, rate_limiter: RateLimiter = None, controller: AdaptiveController = None,
+                 download_workers: int = 4, queue_size: int = 100, media_workers: int = 8, media_store: MediaStore = None,
+                 cache: ResponseCache = None, watermarks: WatermarkStore = None, storage: SqliteStorage = None):
+        """
+        :param max_workers: 并发获取笔记详情的线程数
+        :param rate_limiter: 按账号和接口限速的令牌桶，请求节奏由它控制，默认使用 DEFAULT_RATES
+        :param controller: 按账号自适应调速和熔断的控制器，默认为 None 即不启用
+        :param download_workers: 并发下载媒体文件的线程数
+        :param queue_size: 流水线各阶段之间队列的长度
+        :param media_workers: 下载图片、视频的线程数，所有笔记共用
+        :param media_store: MediaStore，相同的媒体文件只下载、保存一次，默认为 None 即每篇笔记单独保存
+        :param cache: 接口响应缓存，重复运行或任务重叠时相同的请求不再发送，默认为 None 即不缓存
+        :param watermarks: 记录每个用户爬到的最新笔记，spider_user_all_note 增量模式需要
+        :param storage: SqliteStorage，所有爬取的笔记都写入数据库，默认为 None 即不写入
+        """
+        self.max_workers = max_workers
+        self.download_workers = download_workers
+        self.queue_size = queue_size
+        self.watermarks = watermarks
+        self.storage = storage
+        # 所有笔记共用的媒体文件下载器，复用连接
+        self.downloader = MediaDownloader(max_workers=media_workers, store=media_store)
         # 初始化 XHS_Apis 类的实例，用于调用小红书相关的 API
-        self.xhs_apis = XHS_Apis()
+        self.xhs_apis = XHS_Apis(rate_limiter=rate_limiter, controller=controller, cache=cache)
 
     def spider_note(self, note_url: str, cookies_str: str, proxies=None):
         """
         爬取一个笔记的信息
         :param note_url: 笔记的 URL
-        :param cookies_str: 用户的 cookies 字符串
+        :param cookies_str: 用户的 cookies 字符串，也可以是 CookiePool，在多个账号间分配请求
         :param proxies: 代理设置，默认为 None
         :return: 爬取结果的成功状态、消息和笔记信息
         """
@@ -39,72 +72,233 @@ class Data_Spider():
         logger.info(f'爬取笔记信息 {note_url}: {success}, msg: {msg}')
         return success, msg, note_info
 
+    def run_pipeline(self, note_urls, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '',
+                     proxies=None, max_workers: int = None, journal: JobJournal = None, export_empty: bool = True):
+        """
+        用流水线爬取笔记：分页 -> 获取笔记详情 -> 下载媒体文件 -> 导出，各阶段同时进行
+        :param note_urls: 笔记 URL 的可迭代对象，可以是边分页边产生 URL 的生成器
+        :param cookies_str: 用户的 cookies 字符串，也可以是 CookiePool，在多个账号间分配请求
+        :param base_path: 保存路径的字典
+        :param save_choice: 保存选项，可选值为 'all', 'media', 'excel', 'jsonl', 'csv', 'parquet'，多个用逗号分隔，如 'media,parquet'
+        :param excel_name: 导出文件的名称（不包括扩展名），默认为空
+        :param proxies: 代理设置，默认为 None，也可以是 ProxyPool，按代理健康度选择
+        :param max_workers: 并发获取笔记详情的线程数，默认为 self.max_workers
+        :param journal: 任务日志，记录每篇笔记完成的步骤，已经完成的步骤不再重复，默认为 None 即不记录
+        :param export_empty: 没有笔记时是否也生成只有表头的文件，默认为 True
+        :return: 流水线，error 属性为分页过程中出现的异常，notes 为成功获取详情的笔记（NoteRecord），failed 为没有获取到详情或媒体文件没有下载完整的笔记 id，
+                 errors 为失败笔记的原因，permanent 为重试也不会成功的笔记 id（笔记已删除等）
+        """
+        choices = parse_save_choice(save_choice)
+        # 检查需要导出文件时，文件名是否为空
+        if not choices.isdisjoint(EXPORTERS) and excel_name == '':
+            raise ValueError('excel_name 不能为空')
+        failed = set()
+        errors = {}
+        permanent = set()
+        # 没有获取到详情的笔记序号，导出时跳过
+        skipped = set()
+
+        def source():
+            for index, note_url in enumerate(note_urls):
+                if journal is not None:
+                    journal.mark_listed(note_url)
+                yield index, note_url
+            if journal is not None:
+                # 分页正常结束，恢复时直接使用日志中的笔记列表
+                journal.mark_pagination_done()
+
+        def fetch_note(item):
+            # 获取笔记详情，失败的笔记不再进入下游
+            index, note_url = item
+            if journal is not None and get_note_id(note_url) in journal.details:
+                # 之前已经获取过详情
+                return index, journal.details[get_note_id(note_url)]
+            success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
+            if note_info is not None and success:
+                if journal is not None:
+                    journal.mark_detail(get_note_id(note_url), note_info)
+                return index, note_info
+            failed.add(get_note_id(note_url))
+            errors[get_note_id(note_url)] = str(msg)
+            if isinstance(note_info, dict) and classify_response(note_info) == ERROR:
+                # 笔记不存在、没有权限等业务错误，重试也不会成功
+                permanent.add(get_note_id(note_url))
+            skipped.add(index)
+            return None
+
+        def download_media(item):
+            # 下载笔记的媒体文件，下载失败不影响导出
+            index, note_info = item
+            if journal is not None and note_info['note_id'] in journal.media_done:
+                return item
+            try:
+                result = download_note(note_info, base_path['media'], proxies, self.downloader)
+                if not result['failed'] and journal is not None:
+                    journal.mark_media(note_info['note_id'])
+                if result['failed']:
+                    failed.add(note_info['note_id'])
+                    errors[note_info['note_id']] = f'{len(result["failed"])}/{result["total"]} 个文件下载失败'
+                    # 再次爬取时只会下载这些缺少的文件
+                    logger.warning(f'笔记 {note_info["note_id"]} 有 {len(result["failed"])}/{result["total"]} 个文件下载失败: '
+                                   f'{[failed["path"] for failed in result["failed"]]}')
+            except Exception as e:
+                failed.add(note_info['note_id'])
+                errors[note_info['note_id']] = str(e)
+                logger.error(f'下载笔记 {note_info["note_id"]} 失败: {e}')
+            return item
+
+        # 每个选中的格式一个导出器，笔记处理完就写入，不用等全部完成
+        # export_empty 为 False 时等到第一篇笔记才创建导出器，没有笔记时不生成文件
+        exporters = get_exporters(choices, base_path['excel'], excel_name) if export_empty else None
+        notes = []
+        # 各阶段并发处理，先完成的笔记暂存，按原顺序导出
+        pending = {}
+        next_index = 0
+
+        def write(note_info):
+            nonlocal exporters
+            if exporters is None:
+                exporters = get_exporters(choices, base_path['excel'], excel_name)
+            # 只保留紧凑的记录，大批量爬取时内存占用更小
+            notes.append(NoteRecord.from_dict(note_info))
+            for exporter in exporters:
+                exporter.append(note_info)
+            if self.storage is not None:
+                self.storage.add_note(note_info)
+
+        def export(item):
+            nonlocal next_index
+            pending[item[0]] = item[1]
+            while True:
+                if next_index in pending:
+                    write(pending.pop(next_index))
+                elif next_index in skipped:
+                    skipped.discard(next_index)
+                else:
+                    break
+                next_index += 1
+
+        pipeline = Pipeline(source(), self.queue_size)
+        pipeline.add_stage(fetch_note, max_workers or self.max_workers)
+        if 'media' in choices:
+            pipeline.add_stage(download_media, self.download_workers)
+        try:
+            pipeline.run(export)
+        finally:
+            # 出错的笔记不会到达导出阶段，剩下的按顺序写入
+            for index in sorted(pending):
+                write(pending[index])
+            for exporter in exporters or []:
+                exporter.close()
+            if self.storage is not None:
+                self.storage.flush()
+        pipeline.notes = notes
+        pipeline.failed = failed
+        pipeline.errors = errors
+        pipeline.permanent = permanent
+        if 'media' in choices:
+            logger.info(f'媒体文件下载统计: {self.downloader.stats()}')
+            if self.downloader.store is not None:
+                logger.info(f'媒体仓库统计: {self.downloader.store.stats()}')
+        if pipeline.stage_errors:
+            logger.warning(f'流水线各阶段出错丢弃的笔记数: {pipeline.stage_errors}')
+        if exporters and journal is not None:
+            journal.mark_exported()
+        if journal is not None and pipeline.error is None and not failed and not pipeline.stage_errors:
+            journal.mark_done()
+        return pipeline
+
     def spider_some_note(self, notes: list, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '',
-                         proxies=None):
+                         proxies=None, max_workers: int = None, journal: JobJournal = None):
         """
         爬取一些笔记的信息
         :param notes: 笔记 URL 的列表
-        :param cookies_str: 用户的 cookies 字符串
+        :param cookies_str: 用户的 cookies 字符串，也可以是 CookiePool，在多个账号间分配请求
         :param base_path: 保存路径的字典
-        :param save_choice: 保存选项，可选值为 'all', 'media', 'excel'
-        :param excel_name: 保存 Excel 文件的名称，默认为空
-        :param proxies: 代理设置，默认为 None
+        :param save_choice: 保存选项，可选值为 'all', 'media', 'excel', 'jsonl', 'csv', 'parquet'，多个用逗号分隔
+        :param excel_name: 导出文件的名称，默认为空
+        :param proxies: 代理设置，默认为 None，也可以是 ProxyPool，按代理健康度选择
+        :param max_workers: 并发获取笔记详情的线程数，默认为 self.max_workers
+        :param journal: 任务日志，中断后可以用 resume 继续，默认为 None
         :return: 无
         """
-        # 检查保存选项为 'all' 或 'excel' 时，Excel 文件名是否为空
-        if (save_choice == 'all' or save_choice == 'excel') and excel_name == '':
-            raise ValueError('excel_name 不能为空')
-        note_list = []
-        for note_url in notes:
-            # 调用 spider_note 方法爬取单个笔记的信息
-            success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
-            if note_info is not None and success:
-                # 将成功爬取的笔记信息添加到列表中
-                note_list.append(note_info)
-        for note_info in note_list:
-            if save_choice == 'all' or save_choice == 'media':
-                # 下载笔记的媒体文件
-                download_note(note_info, base_path['media'])
-        if save_choice == 'all' or save_choice == 'excel':
-            # 构建 Excel 文件的完整路径
-            file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
-            # 将笔记信息保存到 Excel 文件中
-            save_to_xlsx(note_list, file_path)
+        if journal is not None:
+            journal.begin(JOB_NOTES, {'notes': notes, 'save_choice': save_choice, 'excel_name': excel_name})
+        # 获取详情和下载媒体文件同时进行，请求节奏由限速器控制，导出时保持原顺序
+        self.run_pipeline(notes, cookies_str, base_path, save_choice, excel_name, proxies, max_workers, journal)
 
     def spider_user_all_note(self, user_url: str, cookies_str: str, base_path: dict, save_choice: str,
-                             excel_name: str = '', proxies=None, note_num=10):
+                             excel_name: str = '', proxies=None, note_num=10, since: int = None, incremental: bool = False,
+                             journal: JobJournal = None):
         """
         爬取一个用户的所有笔记
         :param user_url: 用户的 URL
-        :param cookies_str: 用户的 cookies 字符串
+        :param cookies_str: 用户的 cookies 字符串，也可以是 CookiePool，在多个账号间分配请求
         :param base_path: 保存路径的字典
-        :param save_choice: 保存选项，可选值为 'all', 'media', 'excel'
-        :param excel_name: 保存 Excel 文件的名称，默认为空
+        :param save_choice: 保存选项，可选值为 'all', 'media', 'excel', 'jsonl', 'csv', 'parquet'，多个用逗号分隔
+        :param excel_name: 导出文件的名称，默认为空
         :param proxies: 代理设置，默认为 None
-        :param note_num: 笔记数量，默认为 10
+        :param note_num: 笔记数量，默认为 10，数量够了就不再请求下一页
+        :param since: 只爬取这个时间（毫秒时间戳）之后发布的笔记，默认为 None 即不限
+        :param incremental: 增量模式，只爬取上次爬到的笔记之后发布的新笔记，翻到旧笔记就停止，需要设置 watermarks
+                            第一次爬取时按 note_num 爬取最新的笔记，之后不限数量
+                            之后每次的新笔记导出到 {用户id}_{上次水位的时间} 文件，没有新笔记时不生成文件
+        :param journal: 任务日志，中断后可以用 resume 继续，分页已经完成时不再重新分页，默认为 None
         :return: 爬取的笔记 URL 列表、成功状态和消息
         """
         note_list = []
-        try:
-            # 调用 XHS_Apis 类的 get_user_all_notes 方法获取用户的所有笔记信息
-            success, msg, all_note_info = self.xhs_apis.get_user_all_notes(user_url, cookies_str, proxies)
-            if success:
-                # 记录用户的作品数量
-                logger.info(f'用户 {user_url} 作品数量: {len(all_note_info)}')
-                count = 0
-                for simple_note_info in all_note_info:
+        new_note_ids = []
+        user_id = user_url.split('/')[-1].split('?')[0]
+        watermark = None
+        if incremental:
+            if self.watermarks is None:
+                raise ValueError('增量模式需要设置 watermarks')
+            watermark = self.watermarks.get(user_id)
+            if watermark is not None:
+                # 只处理上次之后发布的笔记，笔记按发布时间倒序，翻到旧笔记时分页就会停止
+                note_num = None
+                since = max(since or 0, watermark['note_time'])
+        if journal is not None:
+            journal.begin(JOB_USER, {'user_url': user_url, 'save_choice': save_choice, 'excel_name': excel_name,
+                                     'note_num': note_num, 'since': since, 'incremental': incremental})
+
+        def note_urls():
+            if journal is not None and journal.pagination_done:
+                # 上次已经分页完成，直接使用日志中的笔记列表
+                for note_id, note_url in journal.listed.items():
+                    new_note_ids.append(note_id)
+                    note_list.append(note_url)
+                    yield note_url
+                return
+            # 边分页边产生笔记 URL，拿到第一页就开始获取详情
+            for notes in self.xhs_apis.iter_user_notes(user_url, cookies_str, proxies, note_num, since):
+                for simple_note_info in notes:
+                    if watermark is not None and simple_note_info['note_id'] <= watermark['note_id']:
+                        # 上次已经处理过的笔记
+                        continue
+                    new_note_ids.append(simple_note_info['note_id'])
                     # 构建笔记的 URL
                     note_url = f"https://www.xiaohongshu.com/explore/{simple_note_info['note_id']}?xsec_token={simple_note_info['xsec_token']}"
                     # 将笔记 URL 添加到列表中
                     note_list.append(note_url)
-                    count = count + 1
-                    if count >= note_num:
-                        break
-            if save_choice == 'all' or save_choice == 'excel':
-                # 若保存选项为 'all' 或 'excel'，设置 Excel 文件名
-                excel_name = user_url.split('/')[-1].split('?')[0]
-            # 调用 spider_some_note 方法爬取这些笔记的信息
-            self.spider_some_note(note_list, cookies_str, base_path, save_choice, excel_name, proxies)
+                    yield note_url
+
+        try:
+            if not parse_save_choice(save_choice).isdisjoint(EXPORTERS):
+                # 若需要导出文件，设置导出文件名
+                excel_name = user_id
+                if watermark is not None:
+                    # 增量爬取只导出新笔记，按上次的水位另存一个文件，不覆盖之前导出的文件
+                    excel_name += time.strftime('_%Y%m%d%H%M%S', time.localtime(watermark['note_time'] / 1000))
+            # 调用 run_pipeline 方法爬取这些笔记的信息，增量模式没有新笔记时不生成文件
+            pipeline = self.run_pipeline(note_urls(), cookies_str, base_path, save_choice, excel_name, proxies,
+                                         journal=journal, export_empty=not incremental)
+            success = pipeline.error is None
+            msg = '成功' if success else str(pipeline.error)
+            # 记录用户的作品数量
+            logger.info(f'用户 {user_url} 作品数量: {len(note_list)}')
+            if incremental and success:
+                self.advance_watermark(user_id, new_note_ids, pipeline)
         except Exception as e:
             # 若出现异常，标记为失败并记录异常信息
             success = False
@@ -113,40 +307,84 @@ class Data_Spider():
         logger.info(f'爬取用户所有视频 {user_url}: {success}, msg: {msg}')
         return note_list, success, msg
 
+    def advance_watermark(self, user_id: str, note_ids: list, pipeline: Pipeline):
+        """
+        推进用户的水位：从最早的新笔记开始，推进到第一篇失败的笔记之前，失败的笔记下次还会重新爬取
+        失败次数达到 watermarks.max_attempts 或者出现不可重试的错误的笔记不再阻挡水位，跳过并记录日志
+        :param user_id: 用户 id
+        :param note_ids: 这次发现的新笔记 id
+        :param pipeline: run_pipeline 返回的流水线
+        """
+        done = {note.note_id for note in pipeline.notes} - pipeline.failed
+        # 先记录这次所有失败的笔记，水位停住时后面的笔记也累计次数
+        failures = {}
+        for note_id in note_ids:
+            if note_id in pipeline.failed:
+                failures[note_id] = self.watermarks.add_failure(
+                    user_id, note_id, pipeline.errors.get(note_id, ''), note_id in pipeline.permanent)
+        newest = None
+        for note_id in sorted(note_ids):
+            if note_id not in done:
+                if note_id not in failures:
+                    break
+                attempts, permanent = failures[note_id]
+                if not permanent and attempts < self.watermarks.max_attempts:
+                    break
+                logger.warning(f'笔记 {note_id} 失败 {attempts} 次{"（不可重试）" if permanent else ""}，'
+                               f'水位跳过该笔记: {pipeline.errors.get(note_id, "")}')
+            newest = note_id
+        if newest is not None:
+            self.watermarks.set(user_id, newest)
+            self.watermarks.clear_failures(user_id, newest)
+        logger.info(f'用户 {user_id} 新笔记 {len(note_ids)} 篇，水位: {newest or self.watermarks.get(user_id)}')
+
     def spider_some_search_note(self, query: str, require_num: int, cookies_str: str, base_path: dict, save_choice: str,
-                                sort="general", note_type=0, excel_name: str = '', proxies=None):
+                                sort="general", note_type=0, excel_name: str = '', proxies=None, journal: JobJournal = None):
         """
             指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
             :param query 搜索的关键词
             :param require_num 搜索的数量
-            :param cookies_str 你的cookies
+            :param cookies_str 你的cookies，也可以是 CookiePool
             :param base_path 保存路径
             :param sort 排序方式 general:综合排序, time_descending:时间排序, popularity_descending:热度排序
             :param note_type 笔记类型 0:全部, 1:视频, 2:图文
             :param excel_name 保存 Excel 文件的名称，默认为空
             :param proxies 代理设置，默认为 None
+            :param journal 任务日志，中断后可以用 resume 继续，搜索已经完成时不再重新搜索，默认为 None
             返回搜索的结果
         """
         note_list = []
-        try:
-            # 调用 XHS_Apis 类的 search_some_note 方法搜索笔记
-            success, msg, notes = self.xhs_apis.search_some_note(query, require_num, cookies_str, sort, note_type,
-                                                                 proxies)
-            if success:
+        if journal is not None:
+            journal.begin(JOB_SEARCH, {'query': query, 'require_num': require_num, 'save_choice': save_choice,
+                                       'sort': sort, 'note_type': note_type, 'excel_name': excel_name})
+
+        def note_urls():
+            if journal is not None and journal.pagination_done:
+                # 上次已经搜索完成，直接使用日志中的笔记列表
+                note_list.extend(journal.listed_urls())
+                yield from journal.listed_urls()
+                return
+            # 边搜索边产生笔记 URL，拿到第一页就开始获取详情
+            for notes in self.xhs_apis.iter_search_notes(query, require_num, cookies_str, sort, note_type, proxies):
                 # 过滤出笔记类型的数据
-                notes = list(filter(lambda x: x['model_type'] == "note", notes))
-                # 记录搜索到的笔记数量
-                logger.info(f'搜索关键词 {query} 笔记数量: {len(notes)}')
-                for note in notes:
+                for note in filter(lambda x: x['model_type'] == "note", notes):
                     # 构建笔记的 URL
                     note_url = f"https://www.xiaohongshu.com/explore/{note['id']}?xsec_token={note['xsec_token']}"
                     # 将笔记 URL 添加到列表中
                     note_list.append(note_url)
-            if save_choice == 'all' or save_choice == 'excel':
-                # 若保存选项为 'all' 或 'excel'，设置 Excel 文件名
+                    yield note_url
+
+        try:
+            if not parse_save_choice(save_choice).isdisjoint(EXPORTERS):
+                # 若需要导出文件，设置导出文件名
                 excel_name = query
-            # 调用 spider_some_note 方法爬取这些笔记的信息
-            self.spider_some_note(note_list, cookies_str, base_path, save_choice, excel_name, proxies)
+            # 调用 run_pipeline 方法爬取这些笔记的信息
+            pipeline = self.run_pipeline(note_urls(), cookies_str, base_path, save_choice, excel_name, proxies,
+                                         journal=journal)
+            success = pipeline.error is None
+            msg = '成功' if success else str(pipeline.error)
+            # 记录搜索到的笔记数量
+            logger.info(f'搜索关键词 {query} 笔记数量: {len(note_list)}')
         except Exception as e:
             # 若出现异常，标记为失败并记录异常信息
             success = False
@@ -155,12 +393,51 @@ class Data_Spider():
         logger.info(f'搜索关键词 {query} 笔记: {success}, msg: {msg}')
         return note_list, success, msg
 
+    def resume(self, journal, cookies_str: str, base_path: dict, proxies=None):
+        """
+        按任务日志继续上次中断的任务，已经获取详情和下载完成的笔记不再重复
+        :param journal: JobJournal 或任务日志文件路径
+        :param cookies_str: 用户的 cookies 字符串，也可以是 CookiePool，可以换成新的账号
+        :param base_path: 保存路径的字典
+        :param proxies: 代理设置，默认为 None
+        :return: 任务日志
+        """
+        if isinstance(journal, str):
+            journal = JobJournal(journal)
+        if journal.job is None:
+            raise ValueError(f'任务日志 {journal.path} 中没有任务')
+        logger.info(f'继续任务 {journal.path}: {journal.summary()}')
+        if journal.done:
+            logger.info(f'任务 {journal.path} 已经完成')
+            return journal
+        kind, params = journal.job['kind'], dict(journal.job['params'])
+        if kind == JOB_NOTES:
+            self.spider_some_note(params.pop('notes'), cookies_str, base_path, proxies=proxies, journal=journal, **params)
+        elif kind == JOB_USER:
+            self.spider_user_all_note(params.pop('user_url'), cookies_str, base_path, proxies=proxies, journal=journal, **params)
+        elif kind == JOB_SEARCH:
+            self.spider_some_search_note(params.pop('query'), params.pop('require_num'), cookies_str, base_path,
+                                         proxies=proxies, journal=journal, **params)
+        else:
+            raise ValueError(f'不支持的任务: {kind}')
+        return journal
+
 
 if __name__ == '__main__':
     cookies_str, base_path = init()
+    if os.getenv('COOKIES_LIST'):
+        # 多账号：.env 中 COOKIES_LIST 每行一个账号的 cookies，用账号池在多个账号间分配请求
+        cookies_str = CookiePool.from_env()
     data_spider = Data_Spider()
+    # 相同的图片、视频只保存一份，笔记目录中是硬链接
+    # data_spider = Data_Spider(media_store=MediaStore(os.path.join(base_path['media'], '.store')))
+    # 缓存笔记详情、用户信息和评论接口的响应，重复运行时不再请求
+    # data_spider = Data_Spider(cache=ResponseCache(os.path.join(base_path['excel'], '../cache.db')))
+    # 所有爬取的笔记写入数据库，按 note_id 更新，之后可以用 has_note、get_user_notes 等方法查询
+    # data_spider = Data_Spider(storage=SqliteStorage(os.path.join(base_path['excel'], '../xhs.db')))
     # save_choice: all: 保存所有的信息, media: 保存视频和图片, excel: 保存到excel
-    # save_choice 为 excel 或者 all 时，excel_name 不能为空
+    # jsonl, csv, parquet: 保存为对应格式的文件，方便数据分析，多个选项用逗号分隔，如 'media,parquet'
+    # 需要导出文件时（excel、jsonl、csv、parquet 或者 all），excel_name 不能为空
     # 1
     # notes = [
     #     r'https://www.xiaohongshu.com/explore/67d7c713000000000900e391?xsec_token=AB1ACxbo5cevHxV_bWibTmK8R1DDz0NnAW1PbFZLABXtE=&xsec_source=pc_user',
@@ -170,6 +447,9 @@ if __name__ == '__main__':
     # 2
     user_url = r'https://www.xiaohongshu.com/user/profile/5965ebab50c4b438acc7a2e4?xsec_token=ABG-hrWDPgpak9xJtc2hNVsoGh3pLhem858oPGGGkBy04=&xsec_source=pc_feed'
     data_spider.spider_user_all_note(user_url, cookies_str, base_path, 'all','','',20)
+    # 每天定时刷新时用增量模式，只爬取新发布的笔记
+    # data_spider = Data_Spider(watermarks=WatermarkStore(os.path.join(base_path['excel'], '../watermarks.db')))
+    # data_spider.spider_user_all_note(user_url, cookies_str, base_path, 'all', incremental=True)
 
     # 3
     # query = "酒店洗浴用品报价"
@@ -177,3 +457,8 @@ if __name__ == '__main__':
     # sort = "popularity_descending"
     # note_type = 2
     # data_spider.spider_some_search_note(query, query_num, cookies_str, base_path, 'all', sort, note_type)
+
+    # 长时间的任务可以记录任务日志，中断后（崩溃、账号失效）从日志继续，已经完成的笔记不再重复
+    # journal = JobJournal(os.path.join(base_path['excel'], '../jobs/user.jsonl'))
+    # data_spider.spider_user_all_note(user_url, cookies_str, base_path, 'all', journal=journal)
+    # data_spider.resume(os.path.join(base_path['excel'], '../jobs/user.jsonl'), cookies_str, base_path)
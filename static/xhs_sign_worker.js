@@ -0,0 +1,53 @@
+// 常驻签名进程：只加载一次 jsdom 和签名脚本，之后通过 stdin/stdout 按行收发 JSON
+// 请求: {"id": 1, "fn": "get_request_headers_params", "args": [api, data, a1]}
+// 响应: {"id": 1, "result": {...}} 或 {"id": 1, "error": "..."}
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const vm = require('vm');
+
+// stdout 专用于协议，签名脚本里的 console.log 全部转到 stderr
+const write = process.stdout.write.bind(process.stdout);
+console.log = console.info = console.debug = function () {
+    process.stderr.write(Array.prototype.join.call(arguments, ' ') + '\n');
+};
+
+function send(obj) {
+    write(JSON.stringify(obj) + '\n');
+}
+
+const scriptPath = path.resolve(process.argv[2] || path.join(__dirname, 'xhs_xs_xsc_56.js'));
+global.require = require;
+try {
+    vm.runInThisContext(fs.readFileSync(scriptPath, 'utf-8'), { filename: scriptPath });
+} catch (e) {
+    send({ id: null, error: 'load ' + scriptPath + ' failed: ' + (e && e.stack || e) });
+    process.exit(1);
+}
+send({ id: null, ready: true, pid: process.pid });
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+rl.on('line', function (line) {
+    if (!line.trim()) {
+        return;
+    }
+    let req;
+    try {
+        req = JSON.parse(line);
+    } catch (e) {
+        send({ id: null, error: 'bad request: ' + e.message });
+        return;
+    }
+    try {
+        const fn = global[req.fn];
+        if (typeof fn !== 'function') {
+            throw new Error('function ' + req.fn + ' not found');
+        }
+        send({ id: req.id, result: fn.apply(null, req.args || []) });
+    } catch (e) {
+        send({ id: req.id, error: String(e && e.stack || e) });
+    }
+});
+rl.on('close', function () {
+    process.exit(0);
+});
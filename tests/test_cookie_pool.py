@@ -0,0 +1,38 @@
+import pytest
+
+from xhs_utils.cookie_pool import CookiePool, NoAvailableAccountError
+from xhs_utils.rate_control import AdaptiveController, OK, ERROR, AUTH_EXPIRED, VERIFY
+
+
+def use(pool, outcome, controller=None):
+    account = pool.acquire(controller)
+    pool.release(account, outcome)
+    return account.a1
+
+
+def test_unhealthy_account_is_avoided():
+    pool = CookiePool(['a1=a', 'a1=b'])
+    assert use(pool, VERIFY) == 'a'
+    # 健康度下降的账号不会被优先选中，业务错误不影响健康度
+    assert use(pool, ERROR) == 'b'
+    assert use(pool, OK) == 'b'
+    assert pool.accounts[0].health < pool.accounts[1].health == 1.0
+
+
+def test_expired_account_is_retired():
+    pool = CookiePool(['a1=a', 'a1=b'])
+    pool.accounts[1].health = 0.5
+    assert use(pool, AUTH_EXPIRED) == 'a'
+    assert pool.accounts[0].expired
+    assert {use(pool, OK) for _ in range(3)} == {'b'}
+    assert pool.active_count() == 1
+
+
+def test_budget_and_circuit_limit_selection():
+    pool = CookiePool(['a1=a', 'a1=b'], budget=1)
+    controller = AdaptiveController(failure_threshold=1)
+    controller.record('b', VERIFY)
+    # b 熔断冷却中，a 用完额度后没有可用的账号
+    assert use(pool, OK, controller) == 'a'
+    with pytest.raises(NoAvailableAccountError):
+        pool.acquire(controller)
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import socket
+import threading
+import urllib.parse
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from xhs_utils.download_util import MediaDownloader, IncompleteDownloadError
+from xhs_utils.proxy_pool import ProxyPool
+
+DATA = os.urandom(100 * 1024 + 123)
+SEGMENT_SIZE = 16 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+        /file: 支持 Range
+        /norange: 忽略 Range，总是返回完整的 200
+        /flaky: 支持 Range，第二个分段第一次请求时只发送一半就断开
+        /short: 支持 Range，但每个分段都少一个字节（Content-Length 和实际发送的一致）
+        也可以作为 HTTP 代理使用，请求行中是完整的 URL
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        self.path = urllib.parse.urlparse(self.path).path
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('Range')))
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range') or '')
+        if self.path == '/norange' or match is None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(DATA)))
+            self.end_headers()
+            self.wfile.write(DATA)
+            return
+        start, end = int(match.group(1)), min(int(match.group(2)), len(DATA) - 1)
+        body = DATA[start:end + 1]
+        if self.path == '/short' and end > start:
+            body = body[:-1]
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(DATA)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.path == '/flaky' and start == SEGMENT_SIZE:
+            with server.lock:
+                server.flaky_failures += 1
+                fail = server.flaky_failures == 1
+            if fail:
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.flaky_failures = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def downloader():
+    downloader = MediaDownloader(max_workers=2, range_workers=4, segment_size=SEGMENT_SIZE, timeout=(5, 5))
+    yield downloader
+    downloader.close()
+
+
+def url(server, path):
+    return f'http://127.0.0.1:{server.server_port}{path}'
+
+
+def ranges(server, path):
+    return [header for request_path, header in server.requests if request_path == path and header != 'bytes=0-0']
+
+
+def test_segments_reassemble_to_exact_bytes(server, downloader, tmp_path):
+    file_path = str(tmp_path / 'video.mp4')
+    assert downloader.download_ranged(url(server, '/file'), file_path) == len(DATA)
+    with open(file_path, 'rb') as f:
+        assert f.read() == DATA
+    assert len(ranges(server, '/file')) == -(-len(DATA) // SEGMENT_SIZE)
+    assert not os.path.exists(file_path + '.part')
+    assert not os.path.exists(file_path + '.part.json')
+
+
+def test_resume_after_mid_segment_failure(server, downloader, tmp_path):
+    file_path = str(tmp_path / 'video.mp4')
+    with pytest.raises(Exception):
+        downloader.download_ranged(url(server, '/flaky'), file_path)
+    assert not os.path.exists(file_path)
+    with open(file_path + '.part.json', 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    assert 1 not in state['done'] and 0 in state['done']
+
+    server.requests.clear()
+    assert downloader.download_ranged(url(server, '/flaky'), file_path) == len(DATA)
+    with open(file_path, 'rb') as f:
+        assert f.read() == DATA
+    # 只重新请求没有完成的分段
+    expected = [f'bytes={index * SEGMENT_SIZE}-{min((index + 1) * SEGMENT_SIZE, len(DATA)) - 1}'
+                for index in range(-(-len(DATA) // SEGMENT_SIZE)) if index not in state['done']]
+    assert sorted(ranges(server, '/flaky')) == sorted(expected)
+
+
+def test_fallback_when_server_ignores_range(server, downloader, tmp_path):
+    file_path = str(tmp_path / 'video.mp4')
+    assert downloader.download_ranged(url(server, '/norange'), file_path) == len(DATA)
+    with open(file_path, 'rb') as f:
+        assert f.read() == DATA
+    # 探测请求得到完整的响应后直接保存，不再发分段请求
+    assert len([path for path, _ in server.requests if path == '/norange']) == 1
+    assert not os.path.exists(file_path + '.part')
+
+
+def test_short_segment_raises_incomplete(server, downloader, tmp_path):
+    file_path = str(tmp_path / 'video.mp4')
+    with pytest.raises(IncompleteDownloadError):
+        downloader.download_ranged(url(server, '/short'), file_path)
+    assert not os.path.exists(file_path)
+
+
+class NoopExecutor():
+    # 提交的分段什么也不做就返回，模拟分段没有被记录为完成
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def test_size_mismatch_raises_incomplete(server, downloader, tmp_path, monkeypatch):
+    # 分段都没有报错，但已完成分段的长度之和不等于文件大小时不能当成完整的文件
+    file_path = str(tmp_path / 'video.mp4')
+    with open(file_path + '.part', 'wb') as f:
+        f.truncate(len(DATA))
+    with open(file_path + '.part.json', 'w', encoding='utf-8') as f:
+        json.dump({'url': '', 'total': len(DATA), 'segment_size': SEGMENT_SIZE, 'done': [0, 1]}, f)
+    monkeypatch.setattr(downloader, '_range_executor', NoopExecutor())
+    with pytest.raises(IncompleteDownloadError):
+        downloader.download_ranged(url(server, '/file'), file_path)
+    assert not os.path.exists(file_path)
+
+
+def test_proxy_scored_by_network_errors_only(server, downloader, tmp_path):
+    # 读取响应体时断开是下载的问题，代理已经把响应头送到了，不算代理失败
+    pool = ProxyPool([url(server, '')])
+    with pytest.raises(Exception):
+        downloader.download_ranged(url(server, '/flaky'), str(tmp_path / 'video.mp4'), pool)
+    assert pool.stats()[0]['success_rate'] == 1.0
+    assert pool.stats()[0]['in_flight'] == 0
+
+    # 连接不上的代理才算失败
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    dead_port = sock.getsockname()[1]
+    sock.close()
+    pool = ProxyPool([f'http://127.0.0.1:{dead_port}'])
+    with pytest.raises(Exception):
+        downloader.download(url(server, '/file'), str(tmp_path / 'image.jpg'), pool)
+    assert pool.stats()[0]['success_rate'] == 0.0
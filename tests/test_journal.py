@@ -0,0 +1,56 @@
+import json
+
+from main import Data_Spider
+from xhs_utils.data_util import handle_note_info
+from xhs_utils.journal import JobJournal, get_note_id
+
+NOTE_URLS = [f'https://www.xiaohongshu.com/explore/{note_id}?xsec_token=t' for note_id in ('a' * 24, 'b' * 24, 'c' * 24)]
+
+
+def make_note_info(note_url):
+    return handle_note_info({'id': get_note_id(note_url), 'url': note_url, 'note_card': {
+        'type': 'normal', 'user': {'user_id': 'u', 'nickname': 'n', 'avatar': ''}, 'title': 't', 'desc': '', 'tag_list': [],
+        'time': 1700000000000, 'image_list': [],
+        'interact_info': {'liked_count': '1', 'collected_count': '1', 'comment_count': '1', 'share_count': '1'}}})
+
+
+class FakeSpider(Data_Spider):
+    # 不发请求，failing 中的笔记获取详情失败，记录每次请求的笔记
+    def __init__(self, failing=()):
+        super().__init__(max_workers=2)
+        self.failing = set(failing)
+        self.calls = []
+
+    def spider_note(self, note_url, cookies_str, proxies=None):
+        self.calls.append(get_note_id(note_url))
+        if get_note_id(note_url) in self.failing:
+            return False, '请求失败', None
+        return True, '成功', make_note_info(note_url)
+
+
+def test_resume_refetches_only_failed_notes(tmp_path):
+    base_path = {'media': str(tmp_path / 'media'), 'excel': str(tmp_path)}
+    journal_path = str(tmp_path / 'job.jsonl')
+    spider = FakeSpider(failing={'b' * 24})
+    journal = JobJournal(journal_path)
+    spider.spider_some_note(NOTE_URLS, 'a1=x', base_path, 'jsonl', 'notes', journal=journal)
+    journal.close()
+    assert sorted(spider.calls) == ['a' * 24, 'b' * 24, 'c' * 24]
+
+    # 重新读取日志继续，只有失败的笔记再次请求
+    journal = JobJournal(journal_path)
+    assert not journal.done
+    assert set(journal.details) == {'a' * 24, 'c' * 24}
+    spider = FakeSpider()
+    spider.resume(journal, 'a1=x', base_path)
+    assert spider.calls == ['b' * 24]
+    assert journal.done
+    journal.close()
+
+    with open(tmp_path / 'notes.jsonl', 'r', encoding='utf-8') as f:
+        assert [json.loads(line)['note_id'] for line in f] == ['a' * 24, 'b' * 24, 'c' * 24]
+
+    # 已经完成的任务不再请求
+    spider = FakeSpider()
+    spider.resume(journal_path, 'a1=x', base_path).close()
+    assert spider.calls == []
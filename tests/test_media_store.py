@@ -0,0 +1,32 @@
+import os
+
+from xhs_utils.media_store import MediaStore, get_url_key
+
+FILE_ID = '1040g008310cs1ivn4s605nrj4f0k0q8vo6onavo'
+URL_1 = f'http://sns-webpic-qc.xhscdn.com/202403211626/c4fcab8c0d4f8d2a1f1a9b4b5cbd2c08/{FILE_ID}!nd_dft_wlteh_webp_3'
+URL_2 = f'https://sns-webpic.xhscdn.com/202404010930/0f3e9a7d5b6c4e21a8d7c9b0e1f2a3b4/{FILE_ID}!nd_dft_wlteh_webp_3?a=1'
+
+
+def test_url_key_ignores_signature_segments():
+    assert get_url_key(URL_1) == get_url_key(URL_2) == FILE_ID
+    assert get_url_key('https://sns-video-bd.xhscdn.com/pre_post/1040g2t0abc') == '1040g2t0abc'
+
+
+def test_url_index_hits_across_signatures(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'))
+    note_dir = tmp_path / 'note'
+    note_dir.mkdir()
+    staging_path = store.staging_path(URL_1, 'image_0.jpg')
+    with open(staging_path, 'wb') as f:
+        f.write(b'image')
+    store.add(URL_1, staging_path, str(note_dir / 'image_0.jpg'))
+    store.close()
+
+    # 下一次运行拿到的地址签名不同，也能从索引中直接链接
+    store = MediaStore(str(tmp_path / 'store'))
+    file_path = str(note_dir / 'image_1.jpg')
+    assert store.link_existing(URL_2, file_path)
+    with open(file_path, 'rb') as f:
+        assert f.read() == b'image'
+    assert store.stats()['url_hits'] == 1
+    store.close()
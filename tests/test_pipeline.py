@@ -0,0 +1,46 @@
+from xhs_utils.pipeline import Pipeline
+
+
+def double(item):
+    return item * 2
+
+
+def fail_on_odd(item):
+    if item % 2:
+        raise ValueError(f'odd {item}')
+    return item
+
+
+def test_stage_errors_are_counted_and_dropped():
+    pipeline = Pipeline(range(10), maxsize=2)
+    pipeline.add_stage(fail_on_odd, 3).add_stage(double, 2)
+    assert sorted(pipeline.run()) == [0, 4, 8, 12, 16]
+    assert pipeline.stage_errors == {'fail_on_odd': 5}
+    assert pipeline.error is None
+
+
+def test_source_error_stops_feeding_and_keeps_processed_items():
+    def source():
+        yield from range(3)
+        raise RuntimeError('分页失败')
+
+    pipeline = Pipeline(source())
+    pipeline.add_stage(double, 2)
+    assert sorted(pipeline.run()) == [0, 2, 4]
+    assert str(pipeline.error) == '分页失败'
+    assert pipeline.stage_errors == {}
+
+
+def test_none_results_are_filtered_without_counting():
+    pipeline = Pipeline(range(6))
+    pipeline.add_stage(lambda item: item if item < 3 else None, 2, name='filter')
+    assert sorted(pipeline.run()) == [0, 1, 2]
+    assert pipeline.stage_errors == {}
+
+
+def test_sink_receives_every_item():
+    received = []
+    pipeline = Pipeline(range(20), maxsize=1)
+    pipeline.add_stage(double, 4)
+    assert pipeline.run(received.append) is None
+    assert sorted(received) == [item * 2 for item in range(20)]
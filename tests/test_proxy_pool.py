@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from xhs_utils.proxy_pool import ProxyPool, NoAvailableProxyError
+
+EJECT_TIME = 0.1
+
+
+@pytest.fixture
+def pool():
+    return ProxyPool(['http://127.0.0.1:1', 'http://127.0.0.1:2'], failure_threshold=2, eject_time=EJECT_TIME)
+
+
+def stats(pool, url):
+    return next(proxy for proxy in pool.stats() if proxy['url'] == url)
+
+
+def fail(pool, account):
+    proxy = pool.acquire(account)
+    pool.release(proxy, False)
+    return proxy
+
+
+def test_eject_after_consecutive_failures(pool):
+    pool.pin('a', 'http://127.0.0.1:1')
+    fail(pool, 'a')
+    assert not stats(pool, 'http://127.0.0.1:1')['ejected']
+    fail(pool, 'a')
+    assert stats(pool, 'http://127.0.0.1:1')['ejected']
+    # 被剔除的代理不会再被选中，固定的账号也换到其他代理
+    for _ in range(10):
+        proxy = pool.acquire('a')
+        assert proxy.url == 'http://127.0.0.1:2'
+        pool.release(proxy, True, 0.1)
+
+
+def test_reprobe_after_eject_time(pool):
+    pool.pin('a', 'http://127.0.0.1:1')
+    fail(pool, 'a')
+    fail(pool, 'a')
+    time.sleep(EJECT_TIME * 1.5)
+
+    # 剔除期结束后只放一个探测请求，探测失败立即再次剔除，时长翻倍
+    pool.pin('a', 'http://127.0.0.1:1')
+    probe = pool.acquire('a')
+    assert probe.url == 'http://127.0.0.1:1'
+    pool.pin('b', 'http://127.0.0.1:1')
+    assert pool.acquire('b').url == 'http://127.0.0.1:2'
+    pool.release(probe, False)
+    assert stats(pool, 'http://127.0.0.1:1')['ejections'] == 2
+    time.sleep(EJECT_TIME * 1.2)
+    assert stats(pool, 'http://127.0.0.1:1')['ejected']
+
+    # 探测成功后恢复正常
+    time.sleep(EJECT_TIME * 1.2)
+    pool.pin('a', 'http://127.0.0.1:1')
+    probe = pool.acquire('a')
+    pool.release(probe, True, 0.1)
+    assert stats(pool, 'http://127.0.0.1:1')['ejections'] == 0
+    assert not stats(pool, 'http://127.0.0.1:1')['ejected']
+
+
+def test_all_ejected_raises():
+    pool = ProxyPool(['http://127.0.0.1:1'], failure_threshold=1, eject_time=60)
+    fail(pool, None)
+    with pytest.raises(NoAvailableProxyError):
+        pool.acquire()
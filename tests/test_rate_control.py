@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from xhs_utils.rate_control import (AdaptiveController, CircuitOpenError, classify_response, OK, RATE_LIMITED, VERIFY,
+                                    AUTH_EXPIRED, TRANSIENT, ERROR, CLOSED, OPEN, HALF_OPEN)
+
+COOLDOWN = 0.1
+
+
+@pytest.fixture
+def controller():
+    return AdaptiveController(initial_rate=1000, capacity=100, failure_threshold=2, cooldown=COOLDOWN)
+
+
+def state(controller, account='a'):
+    return controller.stats()[account]['state']
+
+
+def test_classify_by_status_before_body():
+    assert classify_response(None, 461) == VERIFY
+    assert classify_response(None, 429) == RATE_LIMITED
+    assert classify_response(None, 503) == TRANSIENT
+    assert classify_response({'success': True}, 200) == OK
+    assert classify_response({'success': False, 'code': -100}, 200) == AUTH_EXPIRED
+    assert classify_response({'success': False, 'code': -1, 'msg': '笔记不存在'}, 200) == ERROR
+    assert classify_response(error=TimeoutError()) == TRANSIENT
+
+
+def test_circuit_opens_probes_and_closes(controller):
+    controller.record('a', TRANSIENT)
+    assert state(controller) == CLOSED
+    controller.record('a', TRANSIENT)
+    assert state(controller) == OPEN
+    with pytest.raises(CircuitOpenError):
+        controller.before_request('a')
+
+    # 冷却结束后只放一个探测请求
+    time.sleep(COOLDOWN * 1.5)
+    controller.before_request('a')
+    assert state(controller) == HALF_OPEN
+    assert not controller.is_available('a')
+    with pytest.raises(CircuitOpenError):
+        controller.before_request('a')
+
+    controller.record('a', OK)
+    assert state(controller) == CLOSED
+    controller.before_request('a')
+
+
+def test_failed_probe_reopens_with_longer_cooldown(controller):
+    controller.record('a', VERIFY)
+    assert state(controller) == OPEN
+    time.sleep(COOLDOWN * 1.5)
+    controller.before_request('a')
+    controller.record('a', TRANSIENT)
+    assert state(controller) == OPEN
+    # 冷却时间翻倍，原来的冷却时间过后仍然不可用
+    time.sleep(COOLDOWN * 1.5)
+    with pytest.raises(CircuitOpenError):
+        controller.before_request('a')
+
+
+def test_business_errors_do_not_open(controller):
+    for _ in range(5):
+        controller.record('a', ERROR)
+    assert state(controller) == CLOSED
+
+
+def test_cancel_releases_probe_without_recording(controller):
+    controller.record('a', AUTH_EXPIRED)
+    controller._accounts['a'].open_until = 0
+    controller.before_request('a')
+    # 探测请求没有发出去，名额归还，也不计入结果
+    controller.cancel('a')
+    assert controller.is_available('a')
+    assert controller.stats()['a']['counts'] == {AUTH_EXPIRED: 1}
+    controller.before_request('a')
+    controller.record('a', OK)
+    assert state(controller) == CLOSED
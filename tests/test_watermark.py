@@ -0,0 +1,75 @@
+import os
+
+from main import Data_Spider
+from xhs_utils.data_util import handle_note_info
+from xhs_utils.journal import get_note_id
+from xhs_utils.watermark import WatermarkStore
+
+USER_URL = 'https://www.xiaohongshu.com/user/profile/u1'
+# 笔记 id 的前 8 位是发布时间，按时间从早到晚
+NOTE_IDS = [f'{0x65000000 + i:08x}' + '0' * 16 for i in range(4)]
+
+
+class FakeSpider(Data_Spider):
+    # 不发请求，用户主页列出 listed 中的笔记，failing 中的笔记获取详情失败
+    def __init__(self, watermarks, listed, failing=()):
+        super().__init__(watermarks=watermarks)
+        self.listed = listed
+        self.failing = set(failing)
+        self.xhs_apis.iter_user_notes = self.iter_user_notes
+
+    def iter_user_notes(self, user_url, cookies_str, proxies=None, note_num=None, since=None):
+        yield [{'note_id': note_id, 'xsec_token': 't'} for note_id in sorted(self.listed, reverse=True)]
+
+    def spider_note(self, note_url, cookies_str, proxies=None):
+        note_id = get_note_id(note_url)
+        if note_id in self.failing:
+            return False, '请求失败', None
+        return True, '成功', handle_note_info({'id': note_id, 'url': note_url, 'note_card': {
+            'type': 'normal', 'user': {'user_id': 'u1', 'nickname': 'n', 'avatar': ''}, 'title': 't', 'desc': '',
+            'tag_list': [], 'time': 1700000000000, 'image_list': [],
+            'interact_info': {'liked_count': '1', 'collected_count': '1', 'comment_count': '1', 'share_count': '1'}}})
+
+
+def crawl(watermarks, tmp_path, listed, failing=()):
+    base_path = {'media': str(tmp_path / 'media'), 'excel': str(tmp_path)}
+    spider = FakeSpider(watermarks, listed, failing)
+    spider.spider_user_all_note(USER_URL, 'a1=x', base_path, 'jsonl', incremental=True)
+    watermark = watermarks.get('u1')
+    return watermark['note_id'] if watermark else None
+
+
+def test_watermark_stops_before_failed_note(tmp_path):
+    watermarks = WatermarkStore(str(tmp_path / 'watermarks.db'), max_attempts=3)
+    assert crawl(watermarks, tmp_path, NOTE_IDS[:3], failing={NOTE_IDS[1]}) == NOTE_IDS[0]
+    # 失败的笔记下次重新爬取，成功后水位推进到最新
+    assert crawl(watermarks, tmp_path, NOTE_IDS[:3]) == NOTE_IDS[2]
+    assert watermarks.get_failures('u1') == {}
+    watermarks.close()
+
+
+def test_watermark_skips_note_after_max_attempts(tmp_path):
+    watermarks = WatermarkStore(str(tmp_path / 'watermarks.db'), max_attempts=3)
+    for attempt in range(2):
+        assert crawl(watermarks, tmp_path, NOTE_IDS, failing={NOTE_IDS[1]}) == NOTE_IDS[0]
+    assert watermarks.get_failures('u1')[NOTE_IDS[1]]['attempts'] == 2
+    # 第三次仍然失败，跳过这篇笔记
+    assert crawl(watermarks, tmp_path, NOTE_IDS, failing={NOTE_IDS[1]}) == NOTE_IDS[3]
+    assert watermarks.get_failures('u1') == {}
+    watermarks.close()
+
+
+def test_incremental_runs_keep_earlier_exports(tmp_path):
+    watermarks = WatermarkStore(str(tmp_path / 'watermarks.db'))
+    crawl(watermarks, tmp_path, NOTE_IDS[:2])
+    # 没有新笔记时不生成文件，也不覆盖之前的导出
+    crawl(watermarks, tmp_path, NOTE_IDS[:2])
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.jsonl')) == ['u1.jsonl']
+    with open(tmp_path / 'u1.jsonl', 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+    crawl(watermarks, tmp_path, NOTE_IDS)
+    files = sorted(name for name in os.listdir(tmp_path) if name.endswith('.jsonl'))
+    assert len(files) == 2 and files[0] == 'u1.jsonl'
+    with open(tmp_path / files[1], 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+    watermarks.close()
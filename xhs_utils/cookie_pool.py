@@ -0,0 +1,141 @@
+import datetime
+import os
+import threading
+from dotenv import load_dotenv
+from loguru import logger
+from xhs_utils.cookie_util import trans_cookies
+from xhs_utils.rate_control import OK, ERROR, AUTH_EXPIRED
+
+
+class NoAvailableAccountError(Exception):
+    pass
+
+
+class Account():
+    """
+        账号池中的一个账号
+        :param cookies_str: 账号的 cookies
+        :param budget: 每天最多发送的请求数，None 表示不限
+        :param name: 账号名称，默认为 cookies 中的 a1
+    """
+    def __init__(self, cookies_str: str, budget: int = None, name: str = None):
+        self.cookies_str = cookies_str
+        self.a1 = trans_cookies(cookies_str)['a1']
+        self.name = name or self.a1
+        self.budget = budget
+        self.used = 0
+        self.day = datetime.date.today()
+        self.in_flight = 0
+        # 成功率的指数滑动平均，作为健康度
+        self.health = 1.0
+        self.expired = False
+
+    def remaining(self):
+        if self.day != datetime.date.today():
+            # 跨天后重置额度
+            self.day = datetime.date.today()
+            self.used = 0
+        if self.budget is None:
+            return None
+        return self.budget - self.used
+
+
+class CookiePool():
+    """
+        多账号 cookies 池，按健康度和剩余额度在账号间分配请求，登录失效的账号自动下线
+        可以在 XHS_Apis / Data_Spider 中代替 cookies_str 传入
+        :param cookies_list: cookies 字符串列表
+        :param budget: 每个账号每天最多发送的请求数，None 表示不限
+        :param health_alpha: 健康度滑动平均的系数
+    """
+    def __init__(self, cookies_list: list, budget: int = None, health_alpha: float = 0.2):
+        self.accounts = [Account(cookies_str, budget) for cookies_str in cookies_list if cookies_str.strip()]
+        if not self.accounts:
+            raise ValueError('cookies 列表不能为空')
+        self.health_alpha = health_alpha
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs):
+        # 每行一个账号的 cookies，# 开头的行为注释
+        with open(path, 'r', encoding='utf-8') as f:
+            cookies_list = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        return cls(cookies_list, **kwargs)
+
+    @classmethod
+    def from_env(cls, name: str = 'COOKIES_LIST', **kwargs):
+        # 从 .env 读取，多个账号的 cookies 换行分隔；没有配置时退回到单账号的 COOKIES
+        load_dotenv()
+        value = os.getenv(name) or os.getenv('COOKIES') or ''
+        return cls([line.strip() for line in value.splitlines()], **kwargs)
+
+    def _score(self, account):
+        remaining = account.remaining()
+        if remaining is not None and remaining <= 0:
+            return None
+        ratio = 1.0 if remaining is None else remaining / account.budget
+        return account.health * ratio / (1 + account.in_flight)
+
+    def acquire(self, controller=None):
+        """
+            选出当前最合适的账号，调用方用完后必须调用 release
+            :param controller: AdaptiveController，熔断冷却中的账号不参与分配
+            :return: Account
+        """
+        with self._lock:
+            best, best_score = None, None
+            for account in self.accounts:
+                if account.expired:
+                    continue
+                if controller is not None and not controller.is_available(account.a1):
+                    continue
+                score = self._score(account)
+                if score is not None and (best_score is None or score > best_score):
+                    best, best_score = account, score
+            if best is None:
+                raise NoAvailableAccountError('没有可用的账号：账号已失效、额度用完或冷却中')
+            best.in_flight += 1
+            best.used += 1
+            return best
+
+    def release(self, account: Account, outcome: str):
+        """
+            归还账号并记录这次请求的结果
+            :param account: acquire 返回的账号
+            :param outcome: classify_response 的结果
+        """
+        with self._lock:
+            account.in_flight -= 1
+            if outcome == ERROR:
+                # 业务错误与账号健康无关
+                return
+            success = 1.0 if outcome == OK else 0.0
+            account.health = (1 - self.health_alpha) * account.health + self.health_alpha * success
+            # 健康度保留一个下限，冷却结束的账号还有机会被选中
+            account.health = max(account.health, 0.05)
+            if outcome == AUTH_EXPIRED and not account.expired:
+                account.expired = True
+                logger.warning(f'账号 {account.name} 登录已失效，已从账号池下线')
+
+    def retire(self, a1: str):
+        with self._lock:
+            for account in self.accounts:
+                if account.a1 == a1:
+                    account.expired = True
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for account in self.accounts if not account.expired)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    'name': account.name,
+                    'expired': account.expired,
+                    'health': round(account.health, 3),
+                    'used': account.used,
+                    'remaining': account.remaining(),
+                    'in_flight': account.in_flight,
+                } for account in self.accounts
+            ]
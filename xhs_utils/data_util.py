@@ -2,28 +2,96 @@ import json
 import os
 import re
 import time
-import openpyxl
-import requests
-from loguru import logger
-from retry import retry
+from xhs_utils.download_util import get_downloader
+from xhs_utils.export_util import XlsxExporter
 import random
 import time
 
+# 文件名中不允许的字符和换行
+NORM_STR_RE = re.compile(r'[\\/:*?"<>| \r\n]+')
+# Excel 不接受的控制字符
+ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010\013\014\016-\037]')
+# 00 - 59，拼接时间用
+TWO_DIGITS = [f'{i:02d}' for i in range(60)]
+
 def norm_str(str):
-    new_str = re.sub(r"|[\\/:*?\"<>| ]+", "", str).replace('\n', '').replace('\r', '')
+    new_str = NORM_STR_RE.sub('', str)
     return new_str
 
 def norm_text(text):
-    ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
-    text = ILLEGAL_CHARACTERS_RE.sub(r'', text)
+    text = ILLEGAL_CHARACTERS_RE.sub('', text)
     return text
 
+def norm_texts(texts):
+    """
+        批量清理控制字符：先在拼接后的整批文本中查找一次，绝大多数没有控制字符时不用逐个替换
+        :param texts: 字符串的列表
+        :return: 清理后的字符串列表
+    """
+    if not ILLEGAL_CHARACTERS_RE.search(''.join(texts)):
+        return list(texts)
+    return [ILLEGAL_CHARACTERS_RE.sub('', text) for text in texts]
+
 
 def timestamp_to_str(timestamp):
     time_local = time.localtime(timestamp / 1000)
     dt = time.strftime("%Y-%m-%d %H:%M:%S", time_local)
     return dt
 
+def timestamps_to_str(timestamps):
+    """
+        批量把毫秒时间戳转换成和 timestamp_to_str 相同的字符串
+        时区偏移每 15 分钟只查询一次，日期每天只格式化一次，时分秒由整数运算得到
+        :param timestamps: 毫秒时间戳的列表
+        :return: 字符串的列表
+    """
+    offsets = {}
+    days = {}
+    results = []
+    for timestamp in timestamps:
+        seconds = int(timestamp // 1000)
+        # 夏令时等时区偏移的变化都发生在整 15 分钟
+        bucket = seconds // 900
+        offset = offsets.get(bucket)
+        if offset is None:
+            offset = offsets[bucket] = time.localtime(bucket * 900).tm_gmtoff
+        day, rest = divmod(seconds + offset, 86400)
+        date = days.get(day)
+        if date is None:
+            date = days[day] = time.strftime('%Y-%m-%d', time.gmtime(day * 86400))
+        hour, rest = divmod(rest, 3600)
+        minute, second = divmod(rest, 60)
+        results.append(f'{date} {TWO_DIGITS[hour]}:{TWO_DIGITS[minute]}:{TWO_DIGITS[second]}')
+    return results
+
+def to_columns(datas):
+    """
+        把字典的列表转换成列：字段名 -> 值的列表
+    """
+    if not datas:
+        return {}
+    return {key: [data[key] for data in datas] for key in datas[0]}
+
+def id_to_timestamp(object_id):
+    # 笔记 id 的前 8 位十六进制是创建时间的秒级时间戳，返回毫秒时间戳
+    return int(object_id[:8], 16) * 1000
+
+def filter_notes_since(notes, since):
+    """
+        过滤用户主页一页笔记里 since 之前发布的
+        :param notes: 一页笔记信息的列表，按发布时间倒序，置顶笔记除外
+        :param since: 毫秒时间戳
+        :return: since 之后发布的笔记列表，是否出现了早于 since 的非置顶笔记（之后的分页都更早）
+    """
+    kept = []
+    expired = False
+    for note in notes:
+        if id_to_timestamp(note['note_id']) >= since:
+            kept.append(note)
+        elif not note.get('interact_info', {}).get('sticky'):
+            expired = True
+    return kept, expired
+
 def handle_user_info(data, user_id):
     home_url = f'https://www.xiaohongshu.com/user/profile/{user_id}'
     nickname = data['basic_info']['nickname']
@@ -63,77 +131,55 @@ def handle_user_info(data, user_id):
         'tags': tags,
     }
 
-def handle_note_info(data):
-    note_id = data['id']
-    note_url = data['url']
-    note_type = data['note_card']['type']
-    if note_type == 'normal':
+def build_note_info(data, upload_time):
+    # handle_note_info 和 handle_note_infos 共用，upload_time 为已经格式化好的上传时间
+    note_card = data['note_card']
+    user = note_card['user']
+    interact_info = note_card['interact_info']
+    image_list = []
+    for image in note_card['image_list']:
+        info_list = image.get('info_list')
+        if info_list and len(info_list) > 1 and 'url' in info_list[1]:
+            image_list.append(info_list[1]['url'])
+            # success, msg, img_url = XHS_Apis.get_note_no_water_img(info_list[1]['url'])
+    if note_card['type'] == 'normal':
         note_type = '图集'
+        video_cover = None
+        video_addr = None
     else:
         note_type = '视频'
-    user_id = data['note_card']['user']['user_id']
-    home_url = f'https://www.xiaohongshu.com/user/profile/{user_id}'
-    nickname = data['note_card']['user']['nickname']
-    avatar = data['note_card']['user']['avatar']
-    title = data['note_card']['title']
-    if title.strip() == '':
-        title = f'无标题'
-    desc = data['note_card']['desc']
-    liked_count = data['note_card']['interact_info']['liked_count']
-    collected_count = data['note_card']['interact_info']['collected_count']
-    comment_count = data['note_card']['interact_info']['comment_count']
-    share_count = data['note_card']['interact_info']['share_count']
-    image_list_temp = data['note_card']['image_list']
-    image_list = []
-    for image in image_list_temp:
-        try:
-            image_list.append(image['info_list'][1]['url'])
-            # success, msg, img_url = XHS_Apis.get_note_no_water_img(image['info_list'][1]['url'])
-            # image_list.append(img_url)
-        except:
-            pass
-    if note_type == '视频':
         video_cover = image_list[0]
-        video_addr = 'https://sns-video-bd.xhscdn.com/' + data['note_card']['video']['consumer']['origin_video_key']
+        video_addr = 'https://sns-video-bd.xhscdn.com/' + note_card['video']['consumer']['origin_video_key']
         # success, msg, video_addr = XHS_Apis.get_note_no_water_video(note_id)
-    else:
-        video_cover = None
-        video_addr = None
-    tags_temp = data['note_card']['tag_list']
-    tags = []
-    for tag in tags_temp:
-        try:
-            tags.append(tag['name'])
-        except:
-            pass
-    upload_time = timestamp_to_str(data['note_card']['time'])
-    if 'ip_location' in data['note_card']:
-        ip_location = data['note_card']['ip_location']
-    else:
-        ip_location = '未知'
+    title = note_card['title']
     return {
-        'note_id': note_id,
-        'note_url': note_url,
+        'note_id': data['id'],
+        'note_url': data['url'],
         'note_type': note_type,
-        'user_id': user_id,
-        'home_url': home_url,
-        'nickname': nickname,
-        'avatar': avatar,
-        'title': title,
-        'desc': desc,
-        'liked_count': liked_count,
-        'collected_count': collected_count,
-        'comment_count': comment_count,
-        'share_count': share_count,
+        'user_id': user['user_id'],
+        'home_url': f'https://www.xiaohongshu.com/user/profile/{user["user_id"]}',
+        'nickname': user['nickname'],
+        'avatar': user['avatar'],
+        'title': title if title.strip() else '无标题',
+        'desc': note_card['desc'],
+        'liked_count': interact_info['liked_count'],
+        'collected_count': interact_info['collected_count'],
+        'comment_count': interact_info['comment_count'],
+        'share_count': interact_info['share_count'],
         'video_cover': video_cover,
         'video_addr': video_addr,
         'image_list': image_list,
-        'tags': tags,
+        'tags': [tag['name'] for tag in note_card['tag_list'] if isinstance(tag, dict) and 'name' in tag],
         'upload_time': upload_time,
-        'ip_location': ip_location,
+        'ip_location': note_card.get('ip_location', '未知'),
     }
 
-def handle_comment_info(data):
+def handle_note_info(data, upload_time=None):
+    if upload_time is None:
+        upload_time = timestamp_to_str(data['note_card']['time'])
+    return build_note_info(data, upload_time)
+
+def handle_comment_info(data, upload_time=None):
     note_id = data['note_id']
     note_url = data['note_url']
     comment_id = data['id']
@@ -144,7 +190,8 @@ def handle_comment_info(data):
     content = data['content']
     show_tags = data['show_tags']
     like_count = data['like_count']
-    upload_time = timestamp_to_str(data['create_time'])
+    if upload_time is None:
+        upload_time = timestamp_to_str(data['create_time'])
     try:
         ip_location = data['ip_location']
     except:
@@ -176,35 +223,44 @@ def handle_comment_info(data):
         'ip_location': ip_location,
         'pictures': pictures,
     }
+
+def handle_note_infos(datas, columns=False):
+    """
+        批量处理 /feed 返回的笔记，上传时间一次性批量转换
+        :param datas: 笔记的列表，每个笔记需要有 url 字段
+        :param columns: 为 True 时返回列（字段名 -> 值的列表），可以直接交给列式导出
+        :return: 和 handle_note_info 相同的字典的列表，或者列
+    """
+    upload_times = timestamps_to_str([data['note_card']['time'] for data in datas])
+    notes = [build_note_info(data, upload_time) for data, upload_time in zip(datas, upload_times)]
+    return to_columns(notes) if columns else notes
+
+def handle_comment_infos(datas, note_url=None, columns=False):
+    """
+        批量处理一页或多页评论，上传时间一次性批量转换
+        :param datas: 评论的列表，二级评论需要先展开到列表中
+        :param note_url: 笔记的 URL，评论中没有 note_url 字段时使用
+        :param columns: 为 True 时返回列（字段名 -> 值的列表）
+        :return: 和 handle_comment_info 相同的字典的列表，或者列
+    """
+    if note_url is not None:
+        datas = [data if 'note_url' in data else dict(data, note_url=note_url) for data in datas]
+    upload_times = timestamps_to_str([data['create_time'] for data in datas])
+    comments = [handle_comment_info(data, upload_time) for data, upload_time in zip(datas, upload_times)]
+    return to_columns(comments) if columns else comments
+
 def save_to_xlsx(datas, file_path, type='note'):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    if type == 'note':
-        headers = ['笔记id', '笔记url', '笔记类型', '用户id', '用户主页url', '昵称', '头像url', '标题', '描述', '点赞数量', '收藏数量', '评论数量', '分享数量', '视频封面url', '视频地址url', '图片地址url列表', '标签', '上传时间', 'ip归属地']
-    elif type == 'user':
-        headers = ['用户id', '用户主页url', '用户名', '头像url', '小红书号', '性别', 'ip地址', '介绍', '关注数量', '粉丝数量', '作品被赞和收藏数量', '标签']
-    else:
-        headers = ['笔记id', '笔记url', '评论id', '用户id', '用户主页url', '昵称', '头像url', '评论内容', '评论标签', '点赞数量', '上传时间', 'ip归属地', '图片地址url列表']
-    ws.append(headers)
-    for data in datas:
-        data = {k: norm_text(str(v)) for k, v in data.items()}
-        ws.append(list(data.values()))
-    wb.save(file_path)
-    logger.info(f'数据保存至 {file_path}')
+    # 只写模式逐行写入，行数超过 Excel 上限时自动拆分成多个文件
+    with XlsxExporter(file_path, type) as exporter:
+        exporter.extend(datas)
 
-def download_media(path, name, url, type):
+def download_media(path, name, url, type, proxies=None, downloader=None):
+    # 由下载器边下载边写入临时文件，完成后重命名，视频按 Range 分段下载，失败时自动重试
+    downloader = downloader or get_downloader()
     if type == 'image':
-        content = requests.get(url).content
-        with open(path + '/' + name + '.jpg', mode="wb") as f:
-            f.write(content)
+        downloader.fetch(url, path + '/' + name + '.jpg', proxies, type)
     elif type == 'video':
-        res = requests.get(url, stream=True)
-        size = 0
-        chunk_size = 1024 * 1024
-        with open(path + '/' + name + '.mp4', mode="wb") as f:
-            for data in res.iter_content(chunk_size=chunk_size):
-                f.write(data)
-                size += len(data)
+        downloader.fetch(url, path + '/' + name + '.mp4', proxies, type)
 
 def save_user_detail(user, path):
     with open(f'{path}/detail.txt', mode="w", encoding="utf-8") as f:
@@ -247,9 +303,17 @@ def save_note_detail(note, path):
 
 
 
-@retry(tries=3, delay=1)
-def download_note(note_info, path):
+def download_note(note_info, path, proxies=None, downloader=None):
+    """
+        下载一篇笔记的信息和媒体文件，每个文件单独重试，已经下载完成的文件跳过
+        :param note_info: handle_note_info 处理后的笔记信息
+        :param path: 保存的根目录
+        :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+        :param downloader: MediaDownloader，默认使用 get_downloader()
+        :return: 下载结果，包括保存路径、文件总数、下载的字节数和失败的文件列表，再次调用只会下载缺少的文件
+    """
     # time.sleep(random.randint(5, 10))
+    downloader = downloader or get_downloader()
     note_id = note_info['note_id']
     user_id = note_info['user_id']
     title = note_info['title']
@@ -264,15 +328,45 @@ def download_note(note_info, path):
         f.write(json.dumps(note_info) + '\n')
     note_type = note_info['note_type']
     save_note_detail(note_info, save_path)
+    tasks = []
     if note_type == '图集':
         for img_index, img_url in enumerate(note_info['image_list']):
-            download_media(save_path, f'image_{img_index}', img_url, 'image')
+            tasks.append((img_url, f'{save_path}/image_{img_index}.jpg', 'image'))
     elif note_type == '视频':
-        download_media(save_path, 'cover', note_info['video_cover'], 'image')
-        # download_media(save_path, 'video', note_info['video_addr'], 'video')
-    return save_path
+        tasks.append((note_info['video_cover'], f'{save_path}/cover.jpg', 'image'))
+        tasks.append((note_info['video_addr'], f'{save_path}/video.mp4', 'video'))
+    # 同一篇笔记的媒体文件并发下载
+    result = downloader.download_all(tasks, proxies)
+    result['path'] = save_path
+    return result
 
 
 def check_and_create_path(path):
     if not os.path.exists(path):
         os.makedirs(path)
+
+
+if __name__ == '__main__':
+    # 逐条处理和批量处理的速度对比：python -m xhs_utils.data_util
+    import gc
+    def make_note(i):
+        return {'id': f'{i:024x}', 'url': f'https://www.xiaohongshu.com/explore/{i:024x}', 'note_card': {
+            'type': 'normal', 'user': {'user_id': f'user{i % 100}', 'nickname': f'昵称 {i}', 'avatar': 'https://sns-avatar-qc.xhscdn.com/avatar'},
+            'title': f'标题: {i}?', 'desc': '描述文本' * 20, 'tag_list': [{'name': '标签'}] * 3, 'time': 1700000000000 + i * 37000,
+            'interact_info': {'liked_count': '1.2万', 'collected_count': '520', 'comment_count': '31', 'share_count': '10+'},
+            'image_list': [{'info_list': [{}, {'url': f'https://sns-webpic-qc.xhscdn.com/{i}/{j}'}]} for j in range(3)],
+            'ip_location': '上海'}}
+    def bench(name, func, items):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        result = func(items)
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        print(f'{name}: {int(len(items) / elapsed)} 条/秒')
+        return result
+    items = [make_note(i) for i in range(50000)]
+    old = bench('逐条处理', lambda items: [[norm_text(str(v)) for v in handle_note_info(item).values()] for item in items], items)
+    new = bench('批量处理', lambda items: [norm_texts([v if isinstance(v, str) else str(v) for v in note.values()]) for note in handle_note_infos(items)], items)
+    assert old == new
+    bench('批量处理（列）', lambda items: handle_note_infos(items, columns=True), items)
@@ -0,0 +1,338 @@
+import contextlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+from xhs_utils.media_store import MediaStore
+from xhs_utils.proxy_pool import ProxyPool
+from xhs_utils.session_util import NETWORK_ERRORS
+
+# 这些状态码重试可能成功，其他 4xx（403、404 等）重试也没用
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class IncompleteDownloadError(Exception):
+    pass
+
+
+def is_retryable(error: Exception):
+    # 网络错误、超时、下载不完整和部分状态码可以重试，其他错误（如 404、磁盘错误）直接失败
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                              IncompleteDownloadError))
+
+
+class MediaDownloader():
+    """
+        媒体文件下载器：所有笔记、所有图片共用一个连接池和一组下载线程
+        边下载边写入临时文件，下载完成后再原子地重命名，不会留下只写了一半的文件
+        视频按 Range 分段并发下载，中断后从已完成的分段继续
+        :param max_workers: 下载线程数
+        :param pool_size: 连接池大小，默认为下载线程数加分段线程数
+        :param timeout: 超时时间（秒），可以是 (连接超时, 读取超时)
+        :param chunk_size: 每次写入文件的块大小（字节）
+        :param range_workers: 分段下载的线程数，所有视频共用
+        :param segment_size: 分段大小（字节）
+        :param tries: 每个文件最多尝试的次数
+        :param backoff: 第一次重试前等待的秒数，之后每次翻倍
+        :param max_backoff: 最长等待秒数
+        :param store: MediaStore，按内容去重保存，笔记目录中放硬链接或清单，默认为 None 即直接保存到笔记目录
+    """
+    def __init__(self, max_workers: int = 8, pool_size: int = None, timeout=(5, 60), chunk_size: int = 256 * 1024,
+                 range_workers: int = 4, segment_size: int = 4 * 1024 * 1024, tries: int = 3, backoff: float = 1,
+                 max_backoff: float = 30, store: MediaStore = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.segment_size = segment_size
+        self.tries = tries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.store = store
+        pool_size = pool_size or max_workers + range_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 分段用单独的线程池，下载线程等待分段时不会占满线程池互相等待
+        self._range_executor = ThreadPoolExecutor(max_workers=range_workers)
+        self._lock = threading.Lock()
+        self.start_time = None
+        self.bytes = 0
+        self.files = 0
+        self.errors = 0
+        self.skipped = 0
+        self.retries = 0
+
+    @contextlib.contextmanager
+    def _get(self, url: str, proxies=None, headers: dict = None):
+        proxy = None
+        if isinstance(proxies, ProxyPool):
+            # 从代理池中选代理，并把结果反馈给代理池
+            proxy_pool = proxies
+            proxy = proxy_pool.acquire()
+            proxies = proxy.proxies
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = time.time()
+        start = time.time()
+        try:
+            res = self.session.get(url, headers=headers, stream=True, timeout=self.timeout, proxies=proxies)
+        except Exception as e:
+            if proxy is not None:
+                # 只有连接失败和超时才算代理的失败
+                proxy_pool.release(proxy, not isinstance(e, NETWORK_ERRORS))
+            raise
+        if proxy is not None:
+            # 收到响应头就归还代理，耗时不包括传输响应体，下载大视频的代理不会显得很慢
+            # 之后读取响应体、写入磁盘时的错误和代理无关
+            proxy_pool.release(proxy, True, time.time() - start)
+        with res:
+            res.raise_for_status()
+            yield res
+
+    def _add_bytes(self, size):
+        with self._lock:
+            self.bytes += size
+
+    def _finish(self, success):
+        with self._lock:
+            if success:
+                self.files += 1
+            else:
+                self.errors += 1
+
+    def _save(self, res, file_path):
+        # 把响应写入临时文件，校验长度后重命名
+        temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+        size = 0
+        try:
+            with open(temp_path, mode='wb') as f:
+                for data in res.iter_content(chunk_size=self.chunk_size):
+                    f.write(data)
+                    size += len(data)
+                    self._add_bytes(len(data))
+            expected = res.headers.get('Content-Length')
+            if expected is not None and 'Content-Encoding' not in res.headers and size != int(expected):
+                raise IncompleteDownloadError(f'{file_path} 大小不完整: {size}/{expected}')
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return size
+
+    def download(self, url: str, file_path: str, proxies=None):
+        """
+            在当前线程用一个连接下载一个文件
+            :param url: 文件地址
+            :param file_path: 保存路径
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 下载的字节数
+        """
+        with self._get(url, proxies) as res:
+            return self._save(res, file_path)
+
+    def _load_state(self, state_path, total):
+        # 读取分段下载的进度，文件大小或分段大小变了就重新下载
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state['total'] == total and state['segment_size'] == self.segment_size:
+                return set(state['done'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return set()
+
+    def _save_state(self, state_path, url, total, done):
+        temp_path = state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'total': total, 'segment_size': self.segment_size, 'done': sorted(done)}, f)
+        os.replace(temp_path, state_path)
+
+    def _download_segment(self, url, part_path, start, end, proxies):
+        headers = {'Range': f'bytes={start}-{end}'}
+        size = 0
+        with self._get(url, proxies, headers) as res:
+            if res.status_code != 206:
+                raise IncompleteDownloadError(f'服务器不支持分段下载: {res.status_code}')
+            with open(part_path, mode='r+b') as f:
+                f.seek(start)
+                for data in res.iter_content(chunk_size=self.chunk_size):
+                    f.write(data)
+                    size += len(data)
+                    self._add_bytes(len(data))
+        if size != end - start + 1:
+            raise IncompleteDownloadError(f'分段 {start}-{end} 不完整: {size}/{end - start + 1}')
+        return size
+
+    def download_ranged(self, url: str, file_path: str, proxies=None):
+        """
+            在当前线程按 Range 分段并发下载一个大文件，进度保存在 .part.json 中，中断后再次调用会跳过已完成的分段
+            服务器不支持 Range 时退回到单连接下载
+            :param url: 文件地址
+            :param file_path: 保存路径
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 文件大小（字节）
+        """
+        part_path = file_path + '.part'
+        state_path = part_path + '.json'
+        # 用只请求第一个字节的 Range 请求探测文件大小和是否支持分段
+        with self._get(url, proxies, {'Range': 'bytes=0-0'}) as res:
+            content_range = re.match(r'bytes 0-0/(\d+)', res.headers.get('Content-Range', ''))
+            if res.status_code != 206 or content_range is None:
+                # 不支持分段，直接把这个完整的响应写入文件
+                return self._save(res, file_path)
+        total = int(content_range.group(1))
+        done = self._load_state(state_path, total) if os.path.exists(part_path) else set()
+        if not done:
+            with open(part_path, mode='wb') as f:
+                f.truncate(total)
+        segments = [(index, start, min(start + self.segment_size, total) - 1)
+                    for index, start in enumerate(range(0, total, self.segment_size)) if index not in done]
+        state_lock = threading.Lock()
+
+        def fetch(segment):
+            index, start, end = segment
+            self._download_segment(url, part_path, start, end, proxies)
+            with state_lock:
+                done.add(index)
+                self._save_state(state_path, url, total, done)
+
+        futures = [self._range_executor.submit(fetch, segment) for segment in segments]
+        wait(futures)
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+        # .part 文件一开始就扩展到了完整大小，按已完成分段的长度之和校验
+        size = sum(min((index + 1) * self.segment_size, total) - index * self.segment_size for index in done)
+        if size != total:
+            raise IncompleteDownloadError(f'{file_path} 大小不完整: {size}/{total}')
+        os.replace(part_path, file_path)
+        os.remove(state_path)
+        return total
+
+    def _retry(self, download, url, file_path, proxies):
+        # 可重试的错误按指数退避加随机抖动重试，每个文件只在最终成功或失败时计数一次
+        for attempt in range(self.tries):
+            try:
+                size = download(url, file_path, proxies)
+                self._finish(True)
+                return size
+            except Exception as e:
+                if attempt == self.tries - 1 or not is_retryable(e):
+                    self._finish(False)
+                    raise
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                delay = random.uniform(delay / 2, delay)
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f'下载 {url} 失败，{delay:.1f}s 后第 {attempt + 1} 次重试: {e}')
+                time.sleep(delay)
+
+    def _skip(self):
+        with self._lock:
+            self.skipped += 1
+        return 0
+
+    def fetch(self, url: str, file_path: str, proxies=None, type: str = 'image'):
+        """
+            下载一个文件，已经下载完成的文件直接跳过，可重试的错误按指数退避加随机抖动重试
+            :param url: 文件地址
+            :param file_path: 保存路径
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :param type: image 用单连接下载，video 按 Range 分段下载
+            :return: 下载的字节数，跳过时为 0
+        """
+        download = self.download_ranged if type == 'video' else self.download
+        if self.store is None:
+            if os.path.exists(file_path):
+                # 文件是下载完成后才重命名过来的，存在就说明是完整的
+                return self._skip()
+            return self._retry(download, url, file_path, proxies)
+        if self.store.has_file(file_path):
+            return self._skip()
+        with self.store.url_lock(url):
+            if self.store.link_existing(url, file_path):
+                # 这个地址之前下载过，不用再请求
+                return self._skip()
+            staging_path = self.store.staging_path(url, file_path)
+            size = self._retry(download, url, staging_path, proxies)
+            self.store.add(url, staging_path, file_path)
+        return size
+
+    def submit(self, url: str, file_path: str, proxies=None, type: str = 'image'):
+        """
+            提交到下载线程中下载
+            :return: Future，结果为下载的字节数
+        """
+        return self._executor.submit(self.fetch, url, file_path, proxies, type)
+
+    def download_all(self, tasks: list, proxies=None):
+        """
+            并发下载一组文件，等全部结束后返回，单个文件失败不影响其他文件
+            :param tasks: (文件地址, 保存路径, image 或 video) 的列表
+            :param proxies: 代理设置，也可以是 ProxyPool，默认为 None
+            :return: 下载结果，包括文件总数、下载的字节数和失败的文件列表
+        """
+        futures = [(task, self.submit(task[0], task[1], proxies, task[2])) for task in tasks]
+        wait([future for _, future in futures])
+        failed = []
+        size = 0
+        for (url, file_path, type), future in futures:
+            if future.exception() is not None:
+                failed.append({'url': url, 'path': file_path, 'type': type, 'error': str(future.exception())})
+            else:
+                size += future.result()
+        return {
+            'total': len(tasks),
+            'bytes': size,
+            'failed': failed,
+        }
+
+    def stats(self):
+        """
+            :return: 已下载的文件数、失败的文件数（重试后仍然失败）、跳过数、重试次数、字节数和平均速度（字节/秒）
+        """
+        with self._lock:
+            elapsed = time.time() - self.start_time if self.start_time is not None else 0
+            return {
+                'files': self.files,
+                'errors': self.errors,
+                'skipped': self.skipped,
+                'retries': self.retries,
+                'bytes': self.bytes,
+                'elapsed': round(elapsed, 2),
+                'throughput': round(self.bytes / elapsed) if elapsed > 0 else 0,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._range_executor.shutdown(wait=True)
+        self.session.close()
+
+
+_downloader = None
+_downloader_lock = threading.Lock()
+
+
+def get_downloader():
+    # 默认的下载器，第一次使用时创建
+    global _downloader
+    if _downloader is None:
+        with _downloader_lock:
+            if _downloader is None:
+                _downloader = MediaDownloader()
+    return _downloader
+
+
+def set_downloader(downloader: MediaDownloader):
+    global _downloader
+    _downloader = downloader
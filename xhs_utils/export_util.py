@@ -0,0 +1,367 @@
+import csv
+import json
+import os
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from loguru import logger
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Excel 每个工作表最多 1048576 行（包括表头）
+MAX_ROWS = 1048576
+# 超过行数上限时新建文件还是新建工作表
+ROLLOVER_FILE = 'file'
+ROLLOVER_SHEET = 'sheet'
+
+HEADERS = {
+    'note': ['笔记id', '笔记url', '笔记类型', '用户id', '用户主页url', '昵称', '头像url', '标题', '描述', '点赞数量', '收藏数量', '评论数量', '分享数量', '视频封面url', '视频地址url', '图片地址url列表', '标签', '上传时间', 'ip归属地'],
+    'user': ['用户id', '用户主页url', '用户名', '头像url', '小红书号', '性别', 'ip地址', '介绍', '关注数量', '粉丝数量', '作品被赞和收藏数量', '标签'],
+    'comment': ['笔记id', '笔记url', '评论id', '用户id', '用户主页url', '昵称', '头像url', '评论内容', '评论标签', '点赞数量', '上传时间', 'ip归属地', '图片地址url列表'],
+}
+# 计数字段，导出 JSONL、CSV、Parquet 时转换成整数
+COUNT_FIELDS = {
+    'note': ('liked_count', 'collected_count', 'comment_count', 'share_count'),
+    'user': ('follows', 'fans', 'interaction'),
+    'comment': ('like_count',),
+}
+# 列表字段，Parquet 中为字符串列表
+LIST_FIELDS = ('image_list', 'tags', 'show_tags', 'pictures')
+COUNT_UNITS = {'万': 10000, '亿': 100000000}
+
+
+def get_headers(type: str):
+    # 不是笔记和用户时按评论处理
+    return HEADERS.get(type, HEADERS['comment'])
+
+
+def get_count_fields(type: str):
+    return COUNT_FIELDS.get(type, COUNT_FIELDS['comment'])
+
+
+def parse_count(value):
+    """
+        把页面上显示的数量转换成整数，如 '1.2万' -> 12000，'10+' -> 10
+        :return: 整数，无法识别时为 None
+    """
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip().rstrip('+')
+    unit = 1
+    if text and text[-1] in COUNT_UNITS:
+        unit = COUNT_UNITS[text[-1]]
+        text = text[:-1]
+    try:
+        return int(round(float(text) * unit))
+    except ValueError:
+        return None
+
+
+def to_dict(data):
+    # NoteRecord 等记录转换成字典
+    return data if isinstance(data, dict) else data.to_dict()
+
+
+def to_record(data: dict, type: str = 'note'):
+    # 计数字段转换成整数，其他字段不变
+    record = dict(to_dict(data))
+    for key in get_count_fields(type):
+        if key in record:
+            record[key] = parse_count(record[key])
+    return record
+
+
+def to_cells(values):
+    # Excel 不接受控制字符，整行只查找一次，没有控制字符时不用逐个替换
+    cells = [value if isinstance(value, str) else str(value) for value in values]
+    if ILLEGAL_CHARACTERS_RE.search(''.join(cells)):
+        cells = [ILLEGAL_CHARACTERS_RE.sub('', cell) for cell in cells]
+    return cells
+
+
+class XlsxExporter():
+    """
+        流式导出 Excel：使用 openpyxl 的只写模式，每追加一行就写入临时文件，内存占用和行数无关
+        行数达到上限前自动新建文件（name_2.xlsx、name_3.xlsx ...）或新建工作表
+        :param file_path: Excel 文件路径
+        :param type: 数据类型 note, user 或 comment，决定表头
+        :param max_rows: 每个工作表最多的行数（包括表头），默认为 Excel 的上限
+        :param rollover: 超过上限时 file 新建文件，sheet 在同一个文件中新建工作表
+    """
+    def __init__(self, file_path: str, type: str = 'note', max_rows: int = MAX_ROWS, rollover: str = ROLLOVER_FILE):
+        if rollover not in (ROLLOVER_FILE, ROLLOVER_SHEET):
+            raise ValueError(f'不支持的方式: {rollover}')
+        if max_rows < 2:
+            raise ValueError('max_rows 至少为 2')
+        self.file_path = file_path
+        self.headers = get_headers(type)
+        self.max_rows = max_rows
+        self.rollover = rollover
+        # 已经写入的文件
+        self.files = []
+        self.rows = 0
+        self._wb = None
+        self._ws = None
+        self._sheet_rows = 0
+        self._sheets = 0
+
+    def _next_file_path(self):
+        if not self.files:
+            return self.file_path
+        name, ext = os.path.splitext(self.file_path)
+        return f'{name}_{len(self.files) + 1}{ext}'
+
+    def _open_sheet(self):
+        if self._wb is None:
+            self._wb = Workbook(write_only=True)
+            self._sheets = 0
+        self._sheets += 1
+        self._ws = self._wb.create_sheet('Sheet' if self._sheets == 1 else f'Sheet{self._sheets}')
+        self._ws.append(self.headers)
+        self._sheet_rows = 1
+
+    def _save(self):
+        file_path = self._next_file_path()
+        self._wb.save(file_path)
+        self.files.append(file_path)
+        self._wb = None
+        self._ws = None
+        logger.info(f'数据保存至 {file_path}')
+
+    def append(self, data: dict):
+        """
+            追加一行数据
+            :param data: handle_note_info 等函数处理后的字典或 NoteRecord 等记录，按字段的顺序写入各列
+        """
+        if self._ws is None:
+            self._open_sheet()
+        elif self._sheet_rows >= self.max_rows:
+            if self.rollover == ROLLOVER_FILE:
+                self._save()
+            self._open_sheet()
+        values = data.values() if isinstance(data, dict) else data.to_row()
+        self._ws.append(to_cells(values))
+        self._sheet_rows += 1
+        self.rows += 1
+
+    def extend(self, datas):
+        for data in datas:
+            self.append(data)
+
+    def close(self):
+        # 没有数据时也保存一个只有表头的文件
+        if self._ws is None and not self.files:
+            self._open_sheet()
+        if self._wb is not None:
+            self._save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlExporter():
+    """
+        流式导出 JSONL，每行一条 JSON，计数字段为整数
+        :param file_path: 文件路径
+        :param type: 数据类型 note, user 或 comment
+    """
+    def __init__(self, file_path: str, type: str = 'note'):
+        self.file_path = file_path
+        self.type = type
+        self.files = [file_path]
+        self.rows = 0
+        self._file = open(file_path, 'w', encoding='utf-8')
+
+    def append(self, data: dict):
+        self._file.write(json.dumps(to_record(data, self.type), ensure_ascii=False) + '\n')
+        self.rows += 1
+
+    def extend(self, datas):
+        for data in datas:
+            self.append(data)
+
+    def close(self):
+        self._file.close()
+        logger.info(f'数据保存至 {self.file_path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CsvExporter():
+    """
+        流式导出 CSV，列名为字段名，列表字段写成 JSON，计数字段为整数
+        使用带 BOM 的 UTF-8，Excel 直接打开不会乱码
+        :param file_path: 文件路径
+        :param type: 数据类型 note, user 或 comment
+    """
+    def __init__(self, file_path: str, type: str = 'note'):
+        self.file_path = file_path
+        self.type = type
+        self.files = [file_path]
+        self.rows = 0
+        self._file = open(file_path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._fields = None
+
+    def append(self, data: dict):
+        record = to_record(data, self.type)
+        if self._fields is None:
+            # 第一条数据决定列
+            self._fields = list(record.keys())
+            self._writer.writerow(self._fields)
+        row = []
+        for key in self._fields:
+            value = record.get(key)
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, ensure_ascii=False)
+            row.append('' if value is None else value)
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def extend(self, datas):
+        for data in datas:
+            self.append(data)
+
+    def close(self):
+        self._file.close()
+        logger.info(f'数据保存至 {self.file_path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ParquetExporter():
+    """
+        流式导出 Parquet，每 batch_size 条写入一个行组，内存中最多保留一个行组的数据
+        计数字段为 int64，列表字段为字符串列表，其他字段为字符串，需要安装 pyarrow
+        :param file_path: 文件路径
+        :param type: 数据类型 note, user 或 comment
+        :param batch_size: 每个行组的行数
+    """
+    def __init__(self, file_path: str, type: str = 'note', batch_size: int = 10000):
+        if pyarrow is None:
+            raise ImportError('导出 Parquet 需要安装 pyarrow')
+        self.file_path = file_path
+        self.type = type
+        self.batch_size = batch_size
+        self.files = [file_path]
+        self.rows = 0
+        self._batch = []
+        self._schema = None
+        self._writer = None
+
+    def _get_schema(self, record: dict):
+        count_fields = get_count_fields(self.type)
+        fields = []
+        for key in record:
+            if key in count_fields:
+                fields.append(pyarrow.field(key, pyarrow.int64()))
+            elif key in LIST_FIELDS:
+                fields.append(pyarrow.field(key, pyarrow.list_(pyarrow.string())))
+            else:
+                fields.append(pyarrow.field(key, pyarrow.string()))
+        return pyarrow.schema(fields)
+
+    def _to_value(self, field, value):
+        if value is None:
+            return None
+        if pyarrow.types.is_list(field.type):
+            return [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)]
+        if pyarrow.types.is_string(field.type):
+            return value if isinstance(value, str) else str(value)
+        return value
+
+    def _flush(self):
+        if not self._batch:
+            return
+        columns = [
+            pyarrow.array([self._to_value(field, record.get(field.name)) for record in self._batch], type=field.type)
+            for field in self._schema
+        ]
+        table = pyarrow.Table.from_arrays(columns, schema=self._schema)
+        if self._writer is None:
+            self._writer = pyarrow.parquet.ParquetWriter(self.file_path, self._schema)
+        self._writer.write_table(table)
+        self._batch = []
+
+    def append(self, data: dict):
+        record = to_record(data, self.type)
+        if self._schema is None:
+            # 第一条数据决定列
+            self._schema = self._get_schema(record)
+        self._batch.append(record)
+        self.rows += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def extend(self, datas):
+        for data in datas:
+            self.append(data)
+
+    def close(self):
+        # 没有数据时不知道列，不生成文件
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            logger.info(f'数据保存至 {self.file_path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 导出格式到导出器和文件扩展名
+EXPORTERS = {
+    'excel': (XlsxExporter, '.xlsx'),
+    'jsonl': (JsonlExporter, '.jsonl'),
+    'csv': (CsvExporter, '.csv'),
+    'parquet': (ParquetExporter, '.parquet'),
+}
+
+
+def parse_save_choice(save_choice: str):
+    """
+        解析保存选项，all 为 media 和 excel，多个选项用逗号分隔，如 'media,parquet'
+        :return: 选项的集合
+    """
+    choices = set()
+    for choice in save_choice.split(','):
+        choice = choice.strip()
+        if choice == 'all':
+            choices.update(('media', 'excel'))
+        elif choice == 'media' or choice in EXPORTERS:
+            choices.add(choice)
+        elif choice:
+            raise ValueError(f'不支持的保存选项: {choice}')
+    return choices
+
+
+def get_exporters(choices, base_path: str, name: str, type: str = 'note'):
+    """
+        为每个选中的导出格式创建导出器
+        :param choices: parse_save_choice 返回的选项
+        :param base_path: 保存目录
+        :param name: 文件名，不包括扩展名
+        :param type: 数据类型 note, user 或 comment
+        :return: 导出器的列表
+    """
+    exporters = []
+    for format, (exporter_class, ext) in EXPORTERS.items():
+        if format in choices:
+            exporters.append(exporter_class(os.path.abspath(os.path.join(base_path, f'{name}{ext}')), type))
+    return exporters
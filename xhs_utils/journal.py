@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+# 任务的种类
+JOB_NOTES = 'notes'
+JOB_USER = 'user'
+JOB_SEARCH = 'search'
+
+
+def get_note_id(note_url: str):
+    return note_url.split('?')[0].rstrip('/').split('/')[-1]
+
+
+class JobJournal():
+    """
+        任务日志：每完成一步（列出笔记、获取详情、下载媒体、导出）先追加写入一行 JSON 并落盘，
+        程序崩溃或账号失效后用 Data_Spider.resume 从日志继续，已经完成的步骤不再重复
+        :param path: 日志文件路径，已存在时读取其中的进度
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.job = None
+        # note_id -> 笔记 URL，保持列出的顺序
+        self.listed = {}
+        self.details = {}
+        self.media_done = set()
+        self.pagination_done = False
+        self.exported = False
+        self.done = False
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            self._replay()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def _replay(self):
+        end = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f'任务日志 {self.path} 中有不完整的记录，已忽略')
+                    break
+                self._apply(record)
+                end += len(line)
+        if end < os.path.getsize(self.path):
+            # 截掉不完整的部分，后面追加的记录才能正常读取
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def _apply(self, record):
+        event = record['event']
+        if event == 'job':
+            self.job = {'kind': record['kind'], 'params': record['params']}
+        elif event == 'listed':
+            self.listed.setdefault(record['note_id'], record['url'])
+        elif event == 'detail':
+            self.details[record['note_id']] = record['note_info']
+        elif event == 'media':
+            self.media_done.add(record['note_id'])
+        elif event == 'pagination_done':
+            self.pagination_done = True
+        elif event == 'exported':
+            self.exported = True
+        elif event == 'done':
+            self.done = True
+
+    def _write(self, record):
+        record['ts'] = int(time.time() * 1000)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._apply(record)
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def begin(self, kind: str, params: dict):
+        """
+            记录任务的种类和参数，日志中已经有任务时不重复记录
+            :param kind: notes, user 或 search
+            :param params: 任务的参数，恢复时按这些参数继续
+        """
+        if self.job is None:
+            self._write({'event': 'job', 'kind': kind, 'params': params})
+
+    def mark_listed(self, note_url: str):
+        note_id = get_note_id(note_url)
+        if note_id not in self.listed:
+            self._write({'event': 'listed', 'note_id': note_id, 'url': note_url})
+
+    def mark_detail(self, note_id: str, note_info: dict):
+        self._write({'event': 'detail', 'note_id': note_id, 'note_info': note_info})
+
+    def mark_media(self, note_id: str):
+        self._write({'event': 'media', 'note_id': note_id})
+
+    def mark_pagination_done(self):
+        if not self.pagination_done:
+            self._write({'event': 'pagination_done'})
+
+    def mark_exported(self):
+        self._write({'event': 'exported'})
+
+    def mark_done(self):
+        self._write({'event': 'done'})
+
+    def listed_urls(self):
+        return list(self.listed.values())
+
+    def summary(self):
+        return {
+            'job': self.job,
+            'listed': len(self.listed),
+            'details': len(self.details),
+            'media': len(self.media_done),
+            'pagination_done': self.pagination_done,
+            'exported': self.exported,
+            'done': self.done,
+        }
+
+    def close(self):
+        with self._lock:
+            self._file.close()
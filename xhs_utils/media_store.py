@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.parse
+from loguru import logger
+
+HARDLINK = 'hardlink'
+MANIFEST = 'manifest'
+
+
+def get_url_key(url: str):
+    """
+        地址的键：图片地址的路径前面是每次请求都会变的时间戳和签名，如 /202403211626/c4fcab8c.../1040g008...!nd_dft_wlteh_webp_3
+        只用最后一段的文件 id（去掉 ! 后面的格式），换了 CDN 域名、签名或查询参数都能命中
+    """
+    path = urllib.parse.urlparse(url).path
+    return path.rsplit('/', 1)[-1].split('!', 1)[0] or path
+
+
+class MediaStore():
+    """
+        按内容寻址的媒体文件仓库：每个文件按 sha256 只保存一份，笔记目录中放硬链接或清单
+        持久化的索引记录每个地址对应的文件，已经下载过的地址不会再请求
+        :param root: 仓库目录，使用硬链接时需要和笔记目录在同一个文件系统
+        :param mode: hardlink 在笔记目录中创建硬链接，创建失败时退回到清单；manifest 只在笔记目录的 manifest.json 中记录
+    """
+    def __init__(self, root: str, mode: str = HARDLINK):
+        if mode not in (HARDLINK, MANIFEST):
+            raise ValueError(f'不支持的模式: {mode}')
+        self.root = os.path.abspath(root)
+        self.mode = mode
+        self.staging_dir = os.path.join(self.root, 'staging')
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.root, 'index.db'), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS blobs ('
+            'url_key TEXT PRIMARY KEY, digest TEXT NOT NULL, ext TEXT NOT NULL, size INTEGER NOT NULL, created INTEGER NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS blobs_digest ON blobs (digest)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self.url_hits = 0
+        self.content_hits = 0
+        self.added = 0
+
+    def url_lock(self, url: str):
+        # 同一个地址同时只有一个线程下载，另一个线程等它下载完直接链接
+        key = get_url_key(url)
+        with self._lock:
+            lock = self._url_locks.get(key)
+            if lock is None:
+                lock = self._url_locks[key] = threading.Lock()
+            return lock
+
+    def blob_path(self, digest: str, ext: str):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext)
+
+    def staging_path(self, url: str, file_path: str):
+        # 下载中的文件放在仓库里，文件名由地址决定，中断后可以续传
+        ext = os.path.splitext(file_path)[1]
+        return os.path.join(self.staging_dir, hashlib.sha1(get_url_key(url).encode('utf-8')).hexdigest() + ext)
+
+    def _manifest_path(self, file_path: str):
+        return os.path.join(os.path.dirname(file_path), 'manifest.json')
+
+    def _read_manifest(self, file_path: str):
+        try:
+            with open(self._manifest_path(file_path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, file_path: str, url: str, digest: str, ext: str, size: int):
+        with self._lock:
+            manifest = self._read_manifest(file_path)
+            manifest[os.path.basename(file_path)] = {
+                'url': url,
+                'digest': digest,
+                'size': size,
+                'blob': os.path.relpath(self.blob_path(digest, ext), os.path.dirname(file_path)),
+            }
+            temp_path = self._manifest_path(file_path) + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self._manifest_path(file_path))
+
+    def _place(self, url: str, file_path: str, digest: str, ext: str, size: int):
+        # 在笔记目录中放硬链接，失败（跨文件系统等）时记录到清单
+        if self.mode == HARDLINK:
+            try:
+                os.link(self.blob_path(digest, ext), file_path)
+                return
+            except FileExistsError:
+                return
+            except OSError as e:
+                logger.warning(f'创建硬链接失败，记录到清单: {e}')
+        self._write_manifest(file_path, url, digest, ext, size)
+
+    def has_file(self, file_path: str):
+        # 笔记目录中已经有这个文件（硬链接或清单记录）
+        if os.path.exists(file_path):
+            return True
+        entry = self._read_manifest(file_path).get(os.path.basename(file_path))
+        return entry is not None and os.path.exists(os.path.join(os.path.dirname(file_path), entry['blob']))
+
+    def link_existing(self, url: str, file_path: str):
+        """
+            地址已经在索引中时直接放到笔记目录
+            :return: 是否命中
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT digest, ext, size FROM blobs WHERE url_key = ?', (get_url_key(url),)).fetchone()
+        if row is None:
+            return False
+        digest, ext, size = row
+        if not os.path.exists(self.blob_path(digest, ext)):
+            # 仓库文件被删掉了，重新下载
+            return False
+        self._place(url, file_path, digest, ext, size)
+        with self._lock:
+            self.url_hits += 1
+        return True
+
+    def add(self, url: str, staging_path: str, file_path: str):
+        """
+            把下载好的文件按内容移入仓库，写入索引并放到笔记目录
+            :param url: 文件地址
+            :param staging_path: 下载好的文件
+            :param file_path: 笔记目录中的路径
+            :return: 文件的 sha256
+        """
+        sha256 = hashlib.sha256()
+        with open(staging_path, 'rb') as f:
+            for data in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(data)
+        digest = sha256.hexdigest()
+        ext = os.path.splitext(file_path)[1]
+        size = os.path.getsize(staging_path)
+        blob_path = self.blob_path(digest, ext)
+        if os.path.exists(blob_path):
+            # 内容相同的文件已经有了（比如同一张图的不同地址）
+            os.remove(staging_path)
+            with self._lock:
+                self.content_hits += 1
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            shutil.move(staging_path, blob_path)
+            with self._lock:
+                self.added += 1
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO blobs (url_key, digest, ext, size, created) VALUES (?, ?, ?, ?, ?)',
+                (get_url_key(url), digest, ext, size, int(time.time())),
+            )
+            self._conn.commit()
+        self._place(url, file_path, digest, ext, size)
+        return digest
+
+    def stats(self):
+        """
+            :return: 仓库中的文件数、总字节数、索引中的地址数，以及本次运行中地址命中、内容去重和新增的次数
+        """
+        with self._lock:
+            urls, blobs, size = self._conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT digest), '
+                '(SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM blobs)) FROM blobs'
+            ).fetchone()
+            return {
+                'urls': urls,
+                'blobs': blobs,
+                'bytes': size,
+                'url_hits': self.url_hits,
+                'content_hits': self.content_hits,
+                'added': self.added,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,124 @@
+import queue
+import threading
+from loguru import logger
+
+# 队列结束标记
+_STOP = object()
+
+
+class Pipeline():
+    """
+        多阶段流水线：每个阶段一组线程，阶段之间用有界队列连接，上游拿到一条数据下游就能开始处理
+        队列满时上游会等待，内存占用只和队列长度有关，和数据总量无关
+        :param source: 数据来源的可迭代对象，可以是生成器，按需拉取
+        :param maxsize: 阶段之间队列的最大长度
+    """
+    def __init__(self, source, maxsize: int = 100):
+        self.source = source
+        self.maxsize = maxsize
+        self.stages = []
+        # 数据来源抛出的异常，流水线会提前结束，已经进入流水线的数据照常处理完
+        self.error = None
+        # 各阶段处理出错而被丢弃的数据条数 {阶段名称: 条数}
+        self.stage_errors = {}
+        self._errors_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add_stage(self, func, workers: int = 1, name: str = None):
+        """
+            添加一个处理阶段
+            :param func: 处理函数，参数为上一阶段的输出，返回 None 时丢弃这条数据
+            :param workers: 这个阶段的线程数
+            :param name: 阶段名称，用于日志
+            :return: self，可以链式调用
+        """
+        self.stages.append((func, max(1, workers), name or func.__name__))
+        return self
+
+    def _put(self, q, item):
+        # 下游已经停止时不再阻塞
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _feed(self, out_queue, workers):
+        try:
+            for item in self.source:
+                if not self._put(out_queue, item):
+                    return
+        except Exception as e:
+            self.error = e
+            logger.error(f'流水线数据来源出错: {e}')
+        finally:
+            for _ in range(workers):
+                self._put(out_queue, _STOP)
+
+    def _work(self, func, name, in_queue, out_queue, state, next_workers):
+        while True:
+            item = self._get(in_queue)
+            if item is _STOP:
+                break
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error(f'流水线阶段 {name} 出错: {e}')
+                with self._errors_lock:
+                    self.stage_errors[name] = self.stage_errors.get(name, 0) + 1
+                continue
+            if result is not None and not self._put(out_queue, result):
+                return
+        with state['lock']:
+            state['alive'] -= 1
+            last = state['alive'] == 0
+        if last:
+            # 这个阶段的最后一个线程退出时通知下游结束
+            for _ in range(next_workers):
+                self._put(out_queue, _STOP)
+
+    def run(self, sink=None):
+        """
+            运行流水线，直到数据来源耗尽且所有阶段处理完
+            :param sink: 在调用线程中处理最后一个阶段输出的函数，为 None 时收集成列表返回
+            :return: sink 为 None 时返回输出的列表，否则返回 None
+        """
+        queues = [queue.Queue(self.maxsize) for _ in range(len(self.stages) + 1)]
+        worker_counts = [workers for _, workers, _ in self.stages] + [1]
+        threads = [threading.Thread(target=self._feed, args=(queues[0], worker_counts[0]), daemon=True)]
+        for index, (func, workers, name) in enumerate(self.stages):
+            state = {'lock': threading.Lock(), 'alive': workers}
+            for _ in range(workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(func, name, queues[index], queues[index + 1], state, worker_counts[index + 1]),
+                    daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+        results = [] if sink is None else None
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _STOP:
+                    break
+                if sink is None:
+                    results.append(item)
+                else:
+                    sink(item)
+        finally:
+            # sink 出错时让上游线程尽快退出
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        return results
@@ -0,0 +1,218 @@
+import threading
+import time
+from loguru import logger
+from xhs_utils.rate_limiter import TokenBucket
+
+# 响应分类
+OK = 'ok'
+RATE_LIMITED = 'rate_limited'
+VERIFY = 'verify'
+AUTH_EXPIRED = 'auth_expired'
+TRANSIENT = 'transient'
+ERROR = 'error'
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+RATE_LIMITED_CODES = {300013, 300015}
+VERIFY_CODES = {300011, 300012, 461, 471}
+AUTH_EXPIRED_CODES = {-100, -101, -104}
+VERIFY_STATUS = {461, 471}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, account, retry_after):
+        self.account = account
+        self.retry_after = retry_after
+        super().__init__(f'账号 {account} 冷却中，{retry_after:.1f}s 后重试')
+
+
+def classify_response(res_json=None, status_code=None, error: Exception = None):
+    """
+        对一次请求的结果分类
+        :param res_json: 响应的 JSON 数据
+        :param status_code: HTTP 状态码
+        :param error: 请求过程中出现的异常
+        :return: ok, rate_limited, verify, auth_expired, transient, error 之一
+    """
+    if error is not None:
+        # 超时、连接断开等网络问题
+        return TRANSIENT
+    if status_code in VERIFY_STATUS:
+        return VERIFY
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code is not None and status_code >= 500:
+        return TRANSIENT
+    if not isinstance(res_json, dict):
+        return TRANSIENT
+    if res_json.get('success'):
+        return OK
+    code = res_json.get('code')
+    msg = str(res_json.get('msg') or '')
+    if code in AUTH_EXPIRED_CODES or '登录' in msg:
+        return AUTH_EXPIRED
+    if code in VERIFY_CODES or '验证' in msg:
+        return VERIFY
+    if code in RATE_LIMITED_CODES or '频繁' in msg or '频次' in msg:
+        return RATE_LIMITED
+    return ERROR
+
+
+class AccountState():
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.bucket = TokenBucket(rate, capacity)
+        self.state = CLOSED
+        self.open_until = 0
+        self.cooldown = 0
+        self.failures = 0
+        self.probing = False
+        self.last_outcome = None
+        self.counts = {}
+
+
+class AdaptiveController():
+    """
+        按账号自适应调整请求速率，并在被限流、出验证码、登录失效时熔断冷却
+        成功时速率加性增加，被限流时乘性减小（AIMD）
+        :param initial_rate: 每个账号的初始速率（每秒请求数）
+        :param min_rate: 最小速率
+        :param max_rate: 最大速率
+        :param increase: 每次成功增加的速率
+        :param decrease: 被限流时速率乘以的系数
+        :param capacity: 令牌桶允许的突发请求数
+        :param failure_threshold: 连续被限流或网络错误多少次后熔断
+        :param cooldown: 熔断的初始冷却时间（秒），再次熔断时翻倍
+        :param max_cooldown: 最长冷却时间（秒）
+        :param auth_cooldown: 登录失效后的冷却时间（秒）
+    """
+    def __init__(self, initial_rate: float = 0.5, min_rate: float = 0.02, max_rate: float = 2, increase: float = 0.02,
+                 decrease: float = 0.5, capacity: float = 1, failure_threshold: int = 3, cooldown: float = 60,
+                 max_cooldown: float = 1800, auth_cooldown: float = 3600):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.capacity = capacity
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.auth_cooldown = auth_cooldown
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+    def _get(self, account):
+        state = self._accounts.get(account)
+        if state is None:
+            state = AccountState(self.initial_rate, self.capacity)
+            self._accounts[account] = state
+        return state
+
+    def is_available(self, account):
+        # 熔断打开且还没冷却完时不可用
+        with self._lock:
+            state = self._get(account)
+            if state.state == OPEN and time.time() < state.open_until:
+                return False
+            return not (state.state == HALF_OPEN and state.probing)
+
+    def before_request(self, account):
+        """
+            请求前调用
+            :param account: 账号标识
+            :return: 需要等待的秒数
+            :raise CircuitOpenError: 账号熔断冷却中
+        """
+        with self._lock:
+            state = self._get(account)
+            now = time.time()
+            if state.state == OPEN:
+                if now < state.open_until:
+                    raise CircuitOpenError(account, state.open_until - now)
+                # 冷却结束，放一个探测请求过去
+                state.state = HALF_OPEN
+                state.probing = False
+            if state.state == HALF_OPEN:
+                if state.probing:
+                    raise CircuitOpenError(account, self.base_cooldown)
+                state.probing = True
+        return state.bucket.reserve()
+
+    def cancel(self, account):
+        """
+            before_request 之后没有发出请求时调用（没有可用代理、签名失败等），只归还探测名额，不计入结果
+            :param account: 账号标识
+        """
+        with self._lock:
+            state = self._get(account)
+            if state.state == HALF_OPEN:
+                state.probing = False
+
+    def _open(self, account, state, cooldown):
+        state.state = OPEN
+        state.probing = False
+        state.cooldown = min(cooldown, self.max_cooldown)
+        state.open_until = time.time() + state.cooldown
+        logger.warning(f'账号 {account} 熔断冷却 {state.cooldown:.0f}s，最近结果: {state.last_outcome}')
+
+    def _set_rate(self, state, rate):
+        state.rate = max(self.min_rate, min(self.max_rate, rate))
+        state.bucket.set_rate(state.rate)
+
+    def record(self, account, outcome: str):
+        """
+            请求完成后调用，按结果调整速率和熔断状态
+            :param account: 账号标识
+            :param outcome: classify_response 的结果
+        """
+        with self._lock:
+            state = self._get(account)
+            state.last_outcome = outcome
+            state.counts[outcome] = state.counts.get(outcome, 0) + 1
+            was_probe = state.state == HALF_OPEN
+            if outcome == OK:
+                state.failures = 0
+                self._set_rate(state, state.rate + self.increase)
+                if was_probe:
+                    state.state = CLOSED
+                    state.probing = False
+                    state.cooldown = 0
+                    logger.info(f'账号 {account} 恢复，速率 {state.rate:.2f}/s')
+            elif outcome == ERROR:
+                # 业务错误（参数错误、笔记不存在等）与账号健康无关
+                if was_probe:
+                    state.state = CLOSED
+                    state.probing = False
+            elif outcome == AUTH_EXPIRED:
+                self._open(account, state, self.auth_cooldown)
+            elif outcome == VERIFY:
+                self._set_rate(state, state.rate * self.decrease)
+                self._open(account, state, max(self.base_cooldown, state.cooldown * 2))
+            else:
+                if outcome == RATE_LIMITED:
+                    self._set_rate(state, state.rate * self.decrease)
+                state.failures += 1
+                if was_probe or state.failures >= self.failure_threshold:
+                    state.failures = 0
+                    self._open(account, state, max(self.base_cooldown, state.cooldown * 2))
+
+    def stats(self):
+        """
+            :return: 每个账号当前的速率、熔断状态和各类结果的计数，用于监控
+        """
+        with self._lock:
+            now = time.time()
+            return {
+                account: {
+                    'rate': round(state.rate, 4),
+                    'state': state.state,
+                    'retry_after': max(0, round(state.open_until - now, 1)) if state.state == OPEN else 0,
+                    'failures': state.failures,
+                    'last_outcome': state.last_outcome,
+                    'counts': dict(state.counts),
+                } for account, state in self._accounts.items()
+            }
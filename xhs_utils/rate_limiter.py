@@ -0,0 +1,152 @@
+import asyncio
+import random
+import threading
+import time
+
+# 默认的接口限速（每秒请求数），未配置的接口不限速
+# 笔记详情接口最敏感，默认约 6 秒一次，再加上随机抖动，和之前固定 sleep 5-10 秒的节奏相当
+# 评论接口一篇笔记要翻很多页，并发展开二级评论时同一个账号的请求也按这里的速率排队
+DEFAULT_RATES = {
+    '/api/sns/web/v1/feed': 1 / 6,
+    '/api/sns/web/v2/comment/page': 1,
+    '/api/sns/web/v2/comment/sub/page': 1,
+}
+DEFAULT_JITTER = (0, 3)
+
+
+class TokenBucket():
+    """
+        令牌桶，按 rate 匀速生成令牌，最多攒 capacity 个
+        采用预约的方式取令牌：令牌不够时先记账，返回需要等待的时间，调用方自己 sleep，所以多线程和 asyncio 都能用
+        :param rate: 每秒生成的令牌数
+        :param capacity: 桶的容量，即允许的突发请求数
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def reserve(self, tokens: float = 1):
+        """
+            预约令牌
+            :param tokens: 需要的令牌数
+            :return: 需要等待的秒数，0 表示可以立即发送
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter():
+    """
+        按 (账号, 接口) 分别限速的令牌桶集合，可以在多个 XHS_Apis / AsyncXHS_Apis 实例间共享
+        :param rates: 接口路径到每秒请求数的映射，默认为 DEFAULT_RATES
+        :param default_rate: 未在 rates 中配置的接口的每秒请求数，None 表示不限速
+        :param jitter: 每次请求前额外随机等待的秒数范围 (最小, 最大)，None 表示不抖动
+        :param capacity: 每个令牌桶允许的突发请求数
+    """
+    def __init__(self, rates: dict = None, default_rate: float = None, jitter: tuple = DEFAULT_JITTER, capacity: float = 1):
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.default_rate = default_rate
+        self.jitter = jitter
+        self.capacity = capacity
+        # 单独给某个账号配置的限速 {account: {endpoint: rate}}
+        self.account_rates = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint(api: str):
+        # GET 请求的 api 带有查询参数，限速只看路径
+        return api.split('?')[0]
+
+    def get_rate(self, endpoint: str, account: str = None):
+        account_rates = self.account_rates.get(account)
+        if account_rates and endpoint in account_rates:
+            return account_rates[endpoint]
+        return self.rates.get(endpoint, self.default_rate)
+
+    def is_limited(self, api: str, account: str = None):
+        # 接口是否限速
+        return bool(self.get_rate(self.get_endpoint(api), account))
+
+    def set_rate(self, endpoint: str, rate: float, account: str = None):
+        """
+            修改接口的限速，指定 account 时只修改这个账号
+            :param endpoint: 接口路径
+            :param rate: 每秒请求数，None 表示不限速
+            :param account: 账号标识，默认为 None 即所有账号
+        """
+        with self._lock:
+            if account is None:
+                self.rates[endpoint] = rate
+            else:
+                self.account_rates.setdefault(account, {})[endpoint] = rate
+            for (bucket_account, bucket_endpoint), bucket in self._buckets.items():
+                if bucket_endpoint == endpoint and (account is None or bucket_account == account):
+                    new_rate = self.get_rate(endpoint, bucket_account)
+                    if new_rate:
+                        bucket.set_rate(new_rate)
+
+    def get_bucket(self, endpoint: str, account: str = None):
+        key = (account, endpoint)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self.get_rate(endpoint, account)
+            if not rate:
+                return None
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = TokenBucket(rate, self.capacity)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def _reserve(self, api: str, account: str = None):
+        endpoint = self.get_endpoint(api)
+        if not self.get_rate(endpoint, account):
+            return 0
+        wait = self.get_bucket(endpoint, account).reserve()
+        if self.jitter:
+            # 只对限速的接口加抖动，避免请求间隔过于规律
+            wait += random.uniform(*self.jitter)
+        return wait
+
+    def wait(self, api: str, account: str = None):
+        """
+            请求前调用，阻塞到允许发送为止
+            :param api: API 路径，可以带查询参数
+            :param account: 账号标识，默认为 None
+        """
+        wait = self._reserve(api, account)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def wait_async(self, api: str, account: str = None):
+        wait = self._reserve(api, account)
+        if wait > 0:
+            await asyncio.sleep(wait)
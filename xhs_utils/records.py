@@ -0,0 +1,93 @@
+import datetime
+from xhs_utils.export_util import parse_count
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Record():
+    """
+        紧凑的记录：用 __slots__ 保存字段，不为每条数据创建字典
+        计数字段为整数，时间字段为 datetime，列表字段为元组
+        字段顺序和 handle_*_info 返回的字典相同，to_dict、to_row 可以直接交给导出器
+    """
+    __slots__ = ()
+    COUNT_FIELDS = ()
+    TIME_FIELDS = ()
+    LIST_FIELDS = ()
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+            由 handle_*_info 处理后的字典创建记录
+        """
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = data.get(name)
+            if value is not None:
+                if name in cls.COUNT_FIELDS:
+                    value = parse_count(value)
+                elif name in cls.TIME_FIELDS:
+                    if isinstance(value, str):
+                        value = datetime.datetime.strptime(value, TIME_FORMAT)
+                elif name in cls.LIST_FIELDS:
+                    value = tuple(value)
+            setattr(record, name, value)
+        return record
+
+    def _to_value(self, name: str):
+        value = getattr(self, name)
+        if value is None:
+            return None
+        if name in self.TIME_FIELDS:
+            return value.strftime(TIME_FORMAT)
+        if name in self.LIST_FIELDS:
+            return list(value)
+        return value
+
+    def to_dict(self):
+        # 时间格式化成和 handle_*_info 相同的字符串，列表字段转换回列表
+        return {name: self._to_value(name) for name in self.__slots__}
+
+    def to_row(self):
+        # 按字段顺序的一行，和导出的表头对应
+        return [self._to_value(name) for name in self.__slots__]
+
+    def __getitem__(self, name: str):
+        # 兼容按键取值的代码，如 note['note_id']
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.__slots__[0]}={getattr(self, self.__slots__[0])!r})'
+
+
+class NoteRecord(Record):
+    __slots__ = ('note_id', 'note_url', 'note_type', 'user_id', 'home_url', 'nickname', 'avatar', 'title', 'desc',
+                 'liked_count', 'collected_count', 'comment_count', 'share_count', 'video_cover', 'video_addr',
+                 'image_list', 'tags', 'upload_time', 'ip_location')
+    COUNT_FIELDS = ('liked_count', 'collected_count', 'comment_count', 'share_count')
+    TIME_FIELDS = ('upload_time',)
+    LIST_FIELDS = ('image_list', 'tags')
+
+
+class UserRecord(Record):
+    __slots__ = ('user_id', 'home_url', 'nickname', 'avatar', 'red_id', 'gender', 'ip_location', 'desc', 'follows',
+                 'fans', 'interaction', 'tags')
+    COUNT_FIELDS = ('follows', 'fans', 'interaction')
+    LIST_FIELDS = ('tags',)
+
+
+class CommentRecord(Record):
+    __slots__ = ('note_id', 'note_url', 'comment_id', 'user_id', 'home_url', 'nickname', 'avatar', 'content',
+                 'show_tags', 'like_count', 'upload_time', 'ip_location', 'pictures')
+    COUNT_FIELDS = ('like_count',)
+    TIME_FIELDS = ('upload_time',)
+    LIST_FIELDS = ('show_tags', 'pictures')
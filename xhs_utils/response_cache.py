@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+# 默认缓存的接口和缓存时间（秒），没有列出的接口不缓存
+DEFAULT_TTLS = {
+    '/api/sns/web/v1/feed': 24 * 3600,
+    '/api/sns/web/v1/user/otherinfo': 6 * 3600,
+    '/api/sns/web/v2/comment/page': 3600,
+    '/api/sns/web/v2/comment/sub/page': 3600,
+}
+# 访问令牌和来源不影响返回的内容，同一篇笔记从搜索和用户主页进入时这两个参数不同
+IGNORED_PARAMS = {'xsec_token', 'xsec_source'}
+
+
+def get_cache_key(method: str, api: str, data=None):
+    """
+        由接口和规范化后的参数生成缓存键，参数按名称排序并去掉 IGNORED_PARAMS
+        :return: 接口路径，缓存键
+    """
+    urlParse = urllib.parse.urlparse(api)
+    params = [(k, v) for k, v in urllib.parse.parse_qsl(urlParse.query, keep_blank_values=True) if k not in IGNORED_PARAMS]
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k not in IGNORED_PARAMS}
+    key = json.dumps([method.upper(), urlParse.path, sorted(params), data or None], ensure_ascii=False, sort_keys=True,
+                     separators=(',', ':'))
+    return urlParse.path, key
+
+
+class ResponseCache():
+    """
+        保存在 SQLite 中的接口响应缓存，命中时不用签名也不用发请求
+        按接口设置缓存时间，条目数超过上限时淘汰最久没有访问的
+        缓存键不包含账号，不同账号请求同一个接口会共用缓存
+        :param path: SQLite 数据库文件
+        :param ttls: 接口路径到缓存时间（秒）的字典，默认为 DEFAULT_TTLS
+        :param max_entries: 最多缓存的条目数
+    """
+    def __init__(self, path: str, ttls: dict = None, max_entries: int = 100000):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._sets = 0
+
+    def _count(self, endpoint, name):
+        counts = self._counts.setdefault(endpoint, {'hits': 0, 'misses': 0})
+        counts[name] += 1
+
+    def get(self, method: str, api: str, data=None):
+        """
+            :return: 缓存的响应 JSON，没有缓存、已过期或接口不缓存时为 None
+        """
+        endpoint, key = get_cache_key(method, api, data)
+        if endpoint not in self.ttls:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < now:
+                self._count(endpoint, 'misses')
+                return None
+            self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self._count(endpoint, 'hits')
+        return json.loads(row[0])
+
+    def set(self, method: str, api: str, data, res_json):
+        # 只缓存成功的响应
+        endpoint, key = get_cache_key(method, api, data)
+        ttl = self.ttls.get(endpoint)
+        if not ttl or not isinstance(res_json, dict) or not res_json.get('success'):
+            return
+        now = time.time()
+        value = json.dumps(res_json, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, endpoint, value, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, endpoint, value, now + ttl, now),
+            )
+            self._sets += 1
+            if self._sets % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # 先删过期的，再按最久没有访问的顺序删到上限以内
+        self._conn.execute('DELETE FROM responses WHERE expires < ?', (now,))
+        count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,),
+            )
+
+    def evict(self):
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+
+    def clear(self, endpoint: str = None):
+        with self._lock:
+            if endpoint is None:
+                self._conn.execute('DELETE FROM responses')
+            else:
+                self._conn.execute('DELETE FROM responses WHERE endpoint = ?', (endpoint,))
+            self._conn.commit()
+
+    def stats(self):
+        """
+            :return: 每个接口的命中、未命中次数和命中率，以及缓存的条目数
+        """
+        with self._lock:
+            entries = dict(self._conn.execute('SELECT endpoint, COUNT(*) FROM responses GROUP BY endpoint').fetchall())
+            endpoints = {}
+            for endpoint in set(self._counts) | set(entries):
+                counts = self._counts.get(endpoint, {'hits': 0, 'misses': 0})
+                total = counts['hits'] + counts['misses']
+                endpoints[endpoint] = {
+                    'hits': counts['hits'],
+                    'misses': counts['misses'],
+                    'hit_rate': round(counts['hits'] / total, 3) if total else 0,
+                    'entries': entries.get(endpoint, 0),
+                }
+            return endpoints
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
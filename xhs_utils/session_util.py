@@ -0,0 +1,190 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from xhs_utils.cookie_util import trans_cookies
+from xhs_utils.xhs_util import get_request_headers_template, generate_sign_headers, agenerate_sign_headers
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# 每次请求都要重新生成的签名头，不放进会话的固定请求头里
+SIGN_HEADER_KEYS = ('x-b3-traceid', 'x-s', 'x-s-common', 'x-t', 'x-xray-traceid')
+# 连接失败和超时，只有这些错误说明代理有问题
+NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout) + ((httpx.TransportError,) if httpx is not None else ())
+
+
+def get_static_headers():
+    headers = get_request_headers_template()
+    for key in SIGN_HEADER_KEYS:
+        headers.pop(key, None)
+    return headers
+
+
+def get_httpx_timeout(timeout):
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return httpx.Timeout(timeout)
+
+
+def get_proxy_url(proxies: dict = None):
+    # httpx 的代理是按客户端配置的，从 requests 风格的代理字典中取出代理地址
+    if not proxies:
+        return None
+    return proxies.get('https') or proxies.get('http')
+
+
+def new_httpx_client(client_class, proxy, **kwargs):
+    try:
+        return client_class(proxy=proxy, **kwargs)
+    except TypeError:
+        # 旧版本 httpx 的参数名是 proxies
+        return client_class(proxies=proxy, **kwargs)
+
+
+class XHS_Session():
+    """
+        单个账号的请求上下文：cookies 只解析一次，固定请求头只构建一次，并复用 keep-alive 连接池
+        :param cookies_str: 账号的 cookies
+        :param pool_size: 连接池大小
+        :param timeout: 超时时间（秒），可以是 (连接超时, 读取超时)
+        :param http2: 是否使用 HTTP/2，需要安装 httpx[http2]
+    """
+    def __init__(self, cookies_str: str, pool_size: int = 10, timeout=(5, 30), http2: bool = False):
+        self.cookies_str = cookies_str
+        self.cookies = trans_cookies(cookies_str)
+        self.a1 = self.cookies['a1']
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.headers = get_static_headers()
+        self._lock = threading.Lock()
+        if http2:
+            if httpx is None:
+                raise ImportError('使用 HTTP/2 需要安装 httpx[http2]')
+            # httpx 的代理是按客户端配置的，每个代理对应一个客户端
+            self._clients = {}
+        else:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.session.headers.update(self.headers)
+            self.session.cookies.update(self.cookies)
+
+    def _get_http2_client(self, proxies: dict = None):
+        proxy = get_proxy_url(proxies)
+        with self._lock:
+            client = self._clients.get(proxy)
+            if client is None:
+                client = new_httpx_client(
+                    httpx.Client, proxy,
+                    http2=True,
+                    headers=self.headers,
+                    cookies=self.cookies,
+                    timeout=get_httpx_timeout(self.timeout),
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+                self._clients[proxy] = client
+            return client
+
+    def sign(self, api: str, data=''):
+        """
+            生成签名头
+            :param api: 参与签名的 API 路径（GET 请求包含查询参数）
+            :param data: POST 请求的数据
+            :return: 签名头，编码后的请求体
+        """
+        headers, data = generate_sign_headers(self.a1, api, data)
+        return headers, data.encode('utf-8') if data else None
+
+    def send(self, method: str, url: str, headers: dict, content: bytes = None, proxies: dict = None):
+        """
+            发送签名好的请求
+            :param method: GET 或 POST
+            :param url: 完整的请求地址
+            :param headers: sign 返回的签名头
+            :param content: sign 返回的请求体
+            :param proxies: 代理设置，默认为 None
+            :return: 响应对象
+        """
+        if self.http2:
+            client = self._get_http2_client(proxies)
+            return client.request(method, url, headers=headers, content=content)
+        return self.session.request(method, url, headers=headers, data=content, proxies=proxies, timeout=self.timeout)
+
+    def request(self, method: str, url: str, api: str, data='', proxies: dict = None):
+        """
+            签名并发送请求
+            :param method: GET 或 POST
+            :param url: 完整的请求地址
+            :param api: 参与签名的 API 路径（GET 请求包含查询参数）
+            :param data: POST 请求的数据
+            :param proxies: 代理设置，默认为 None
+            :return: 响应对象
+        """
+        headers, content = self.sign(api, data)
+        return self.send(method, url, headers, content, proxies)
+
+    def close(self):
+        if self.http2:
+            with self._lock:
+                for client in self._clients.values():
+                    client.close()
+                self._clients.clear()
+        else:
+            self.session.close()
+
+
+class AsyncXHS_Session():
+    """
+        XHS_Session 的异步版本，基于 httpx.AsyncClient
+        :param cookies_str: 账号的 cookies
+        :param pool_size: 连接池大小
+        :param timeout: 超时时间（秒），可以是 (连接超时, 读取超时)
+        :param http2: 是否使用 HTTP/2，需要安装 httpx[http2]
+    """
+    def __init__(self, cookies_str: str, pool_size: int = 100, timeout=(5, 30), http2: bool = False):
+        if httpx is None:
+            raise ImportError('异步客户端需要安装 httpx')
+        self.cookies_str = cookies_str
+        self.cookies = trans_cookies(cookies_str)
+        self.a1 = self.cookies['a1']
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.headers = get_static_headers()
+        self._clients = {}
+
+    def _get_client(self, proxies: dict = None):
+        # 只在事件循环线程中调用，不需要加锁
+        proxy = get_proxy_url(proxies)
+        client = self._clients.get(proxy)
+        if client is None:
+            client = new_httpx_client(
+                httpx.AsyncClient, proxy,
+                http2=self.http2,
+                headers=self.headers,
+                cookies=self.cookies,
+                timeout=get_httpx_timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            self._clients[proxy] = client
+        return client
+
+    async def sign(self, api: str, data=''):
+        headers, data = await agenerate_sign_headers(self.a1, api, data)
+        return headers, data.encode('utf-8') if data else None
+
+    async def send(self, method: str, url: str, headers: dict, content: bytes = None, proxies: dict = None):
+        return await self._get_client(proxies).request(method, url, headers=headers, content=content)
+
+    async def request(self, method: str, url: str, api: str, data='', proxies: dict = None):
+        headers, content = await self.sign(api, data)
+        return await self.send(method, url, headers, content, proxies)
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+STATIC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../static'))
+WORKER_SCRIPT = os.path.join(STATIC_PATH, 'xhs_sign_worker.js')
+_static_path = None
+
+
+def get_static_path():
+    # JS 脚本目录，优先级: set_static_path > 环境变量 XHS_STATIC_PATH > 项目自带的 static 目录
+    return _static_path or os.getenv('XHS_STATIC_PATH') or STATIC_PATH
+
+
+def set_static_path(path: str):
+    global _static_path
+    _static_path = os.path.abspath(path) if path else None
+
+
+def get_static_file(name: str):
+    return os.path.join(get_static_path(), name)
+
+
+class SignError(Exception):
+    pass
+
+
+class SignWorker():
+    """
+        常驻的 Node 签名进程，jsdom 和签名脚本只加载一次，之后通过 stdin/stdout 逐行收发 JSON
+        进程崩溃或超时会自动重启
+        :param script_path: 签名脚本路径，默认为 JS 脚本目录下的 xhs_xs_xsc_56.js，在进程启动时才解析
+        :param node_path: node 可执行文件路径，默认从 PATH 中查找
+        :param timeout: 单次调用的超时时间（秒）
+        :param max_restarts: 单次调用失败后最多重启重试的次数
+    """
+    def __init__(self, script_path: str = None, node_path: str = None, timeout: float = 30, max_restarts: int = 2):
+        self.script_path = script_path
+        self.node_path = node_path or shutil.which('node') or 'node'
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.restart_count = 0
+        self._proc = None
+        self._lines = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # 工作目录设为项目根目录，保证能找到 node_modules 里的 jsdom
+        self._proc = subprocess.Popen(
+            [self.node_path, WORKER_SCRIPT, self.script_path or get_static_file('xhs_xs_xsc_56.js')],
+            cwd=os.path.dirname(STATIC_PATH),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        # 用后台线程读取 stdout，这样可以对每次调用设置超时（Windows 的管道不支持 select）
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_stdout, args=(self._proc, self._lines), daemon=True).start()
+        ready = self._read(self._lines)
+        if not ready.get('ready'):
+            self._kill()
+            raise SignError(ready.get('error', '签名进程启动失败'))
+        logger.info(f'签名进程已启动 pid: {ready["pid"]}')
+
+    @staticmethod
+    def _read_stdout(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        # EOF 说明进程已退出
+        lines.put(None)
+
+    def _read(self, lines):
+        try:
+            line = lines.get(timeout=self.timeout)
+        except queue.Empty:
+            raise SignError(f'签名进程 {self.timeout}s 内无响应')
+        if line is None:
+            raise SignError('签名进程已退出')
+        return json.loads(line)
+
+    def _kill(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=5)
+            except Exception:
+                pass
+        self._proc = None
+        self._lines = None
+
+    def _alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        with self._lock:
+            if not self._alive():
+                self._start()
+
+    def call(self, fn: str, *args):
+        """
+            调用签名脚本中的全局函数
+            :param fn: 函数名，例如 get_request_headers_params
+            :param args: 函数参数，需要可以被 JSON 序列化
+            :return: 函数的返回值
+        """
+        with self._lock:
+            attempt = 0
+            while True:
+                try:
+                    if not self._alive():
+                        self._start()
+                    self._seq += 1
+                    self._proc.stdin.write(json.dumps({'id': self._seq, 'fn': fn, 'args': args}, ensure_ascii=False) + '\n')
+                    self._proc.stdin.flush()
+                    while True:
+                        res = self._read(self._lines)
+                        if res.get('id') == self._seq:
+                            break
+                except (OSError, ValueError, SignError) as e:
+                    # 管道断开、输出异常或超时，杀掉进程后重启重试
+                    self._kill()
+                    if attempt >= self.max_restarts:
+                        raise SignError(f'签名失败: {e}')
+                    attempt += 1
+                    self.restart_count += 1
+                    logger.warning(f'签名进程异常，重启中({attempt}/{self.max_restarts}): {e}')
+                    continue
+                if 'error' in res:
+                    # 脚本内部的异常不是进程问题，直接抛出
+                    raise SignError(res['error'])
+                return res['result']
+
+    async def acall(self, fn: str, *args):
+        # 在线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.call(fn, *args))
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                except Exception:
+                    pass
+            self._kill()
+
+    def __del__(self):
+        try:
+            self._kill()
+        except Exception:
+            pass
+
+
+class SignerPool():
+    """
+        多个常驻签名进程组成的进程池，按最少负载分配签名任务，可在多线程和 asyncio 中使用
+        :param size: 签名进程数量，默认为 CPU 核数
+        :param script_path: 签名脚本路径
+        :param kwargs: 传给 SignWorker 的其他参数
+    """
+    def __init__(self, size: int = None, script_path: str = None, **kwargs):
+        self.size = size or os.cpu_count() or 1
+        self.workers = [SignWorker(script_path, **kwargs) for _ in range(self.size)]
+        self._pending = [0] * self.size
+        self._calls = [0] * self.size
+        self._next = 0
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='signer')
+
+    def start(self):
+        # 并行拉起所有签名进程
+        list(self._executor.map(lambda worker: worker.start(), self.workers))
+
+    def _acquire(self):
+        with self._lock:
+            # 从上次的位置开始找，负载相同时轮流分配
+            order = [(self._next + i) % self.size for i in range(self.size)]
+            index = min(order, key=lambda i: self._pending[i])
+            self._next = (index + 1) % self.size
+            self._pending[index] += 1
+            self._calls[index] += 1
+            return index
+
+    def _release(self, index):
+        with self._lock:
+            self._pending[index] -= 1
+
+    def call(self, fn: str, *args):
+        index = self._acquire()
+        try:
+            return self.workers[index].call(fn, *args)
+        finally:
+            self._release(index)
+
+    async def acall(self, fn: str, *args):
+        def run():
+            with self._lock:
+                self._queued -= 1
+            return self.call(fn, *args)
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+
+    def _queue_depth(self):
+        # 还没轮到签名进程处理的任务数，包括 asyncio 提交后还在排队的任务
+        return self._queued + sum(max(pending - 1, 0) for pending in self._pending)
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queue_depth()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'queue_depth': self._queue_depth(),
+                'workers': [
+                    {
+                        'pending': self._pending[i],
+                        'calls': self._calls[i],
+                        'restarts': worker.restart_count,
+                    } for i, worker in enumerate(self.workers)
+                ],
+            }
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from xhs_utils.export_util import parse_count, to_dict
+
+# 表名 -> (主键, 单独成列的字段, 计数字段)，其余字段只保存在 data 列的 JSON 中
+TABLES = {
+    'notes': ('note_id', ('user_id', 'note_type', 'title', 'upload_time', 'ip_location'),
+              ('liked_count', 'collected_count', 'comment_count', 'share_count')),
+    'users': ('user_id', ('nickname', 'red_id', 'gender', 'ip_location'), ('follows', 'fans', 'interaction')),
+    'comments': ('comment_id', ('note_id', 'user_id', 'upload_time', 'ip_location'), ('like_count',)),
+}
+INDEXES = (
+    ('notes', 'user_id'),
+    ('notes', 'upload_time'),
+    ('comments', 'note_id'),
+    ('comments', 'user_id'),
+    ('comments', 'upload_time'),
+)
+
+
+class SqliteStorage():
+    """
+        保存笔记、用户和评论的 SQLite 数据库，按 id 更新，重复爬取时保留最新的数量
+        写入先放进缓冲区，攒够 batch_size 条后在一个事务中批量写入
+        :param path: SQLite 数据库文件
+        :param batch_size: 每次批量写入的条数
+    """
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for table, (key, columns, counts) in TABLES.items():
+            definitions = [f'{key} TEXT PRIMARY KEY']
+            definitions += [f'{column} TEXT' for column in columns]
+            definitions += [f'{column} INTEGER' for column in counts]
+            definitions += ['data TEXT NOT NULL', 'updated INTEGER NOT NULL']
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({", ".join(definitions)})')
+        for table, column in INDEXES:
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._buffers = {table: [] for table in TABLES}
+
+    def _to_row(self, table: str, data: dict):
+        key, columns, counts = TABLES[table]
+        data = to_dict(data)
+        row = [data[key]]
+        row += [data.get(column) for column in columns]
+        row += [parse_count(data.get(column)) for column in counts]
+        row += [json.dumps(data, ensure_ascii=False), int(time.time())]
+        return row
+
+    def _write(self, table: str, rows: list):
+        key, columns, counts = TABLES[table]
+        names = [key, *columns, *counts, 'data', 'updated']
+        updates = ', '.join(f'{name} = excluded.{name}' for name in names[1:])
+        self._conn.executemany(
+            f'INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" * len(names))}) '
+            f'ON CONFLICT({key}) DO UPDATE SET {updates}',
+            rows,
+        )
+
+    def _add(self, table: str, datas):
+        for data in datas:
+            row = self._to_row(table, data)
+            with self._lock:
+                self._buffers[table].append(row)
+                if len(self._buffers[table]) >= self.batch_size:
+                    self._flush()
+
+    def _flush(self):
+        if not any(self._buffers.values()):
+            return
+        with self._conn:
+            for table, buffer in self._buffers.items():
+                if buffer:
+                    self._write(table, buffer)
+        self._buffers = {table: [] for table in TABLES}
+
+    def add_notes(self, notes):
+        """
+            写入 handle_note_info 处理后的笔记，已经存在的笔记更新为最新的信息
+            :param notes: 笔记信息（字典或 NoteRecord）的可迭代对象
+        """
+        self._add('notes', notes)
+
+    def add_note(self, note: dict):
+        self.add_notes([note])
+
+    def add_users(self, users):
+        # handle_user_info 处理后的用户信息
+        self._add('users', users)
+
+    def add_user(self, user: dict):
+        self.add_users([user])
+
+    def add_comments(self, comments):
+        # handle_comment_info 处理后的评论信息
+        self._add('comments', comments)
+
+    def add_comment(self, comment: dict):
+        self.add_comments([comment])
+
+    def flush(self):
+        # 立即写入缓冲区中的数据
+        with self._lock:
+            self._flush()
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def has_note(self, note_id: str):
+        with self._lock:
+            self._flush()
+            return self._conn.execute('SELECT 1 FROM notes WHERE note_id = ?', (note_id,)).fetchone() is not None
+
+    def get_note(self, note_id: str):
+        """
+            :return: 笔记信息，没有时为 None
+        """
+        notes = self._query('SELECT data FROM notes WHERE note_id = ?', (note_id,))
+        return notes[0] if notes else None
+
+    def get_user(self, user_id: str):
+        """
+            :return: 用户信息（最近一次爬取时的数量），没有时为 None
+        """
+        users = self._query('SELECT data FROM users WHERE user_id = ?', (user_id,))
+        return users[0] if users else None
+
+    def get_user_notes(self, user_id: str, since: str = None, limit: int = None):
+        """
+            获取用户的笔记，按上传时间倒序
+            :param user_id: 用户 id
+            :param since: 只返回这个时间之后上传的笔记，格式和 upload_time 相同，如 '2024-01-01 00:00:00'
+            :param limit: 最多返回的数量，默认为 None 即不限
+            :return: 笔记信息的列表
+        """
+        sql = 'SELECT data FROM notes WHERE user_id = ?'
+        params = [user_id]
+        if since is not None:
+            sql += ' AND upload_time >= ?'
+            params.append(since)
+        sql += ' ORDER BY upload_time DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self._query(sql, params)
+
+    def get_note_comments(self, note_id: str, limit: int = None):
+        """
+            获取笔记的评论，按上传时间排序
+            :return: 评论信息的列表
+        """
+        sql = 'SELECT data FROM comments WHERE note_id = ? ORDER BY upload_time'
+        params = [note_id]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self._query(sql, params)
+
+    def stats(self):
+        """
+            :return: 每个表的条数
+        """
+        with self._lock:
+            self._flush()
+            return {table: self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in TABLES}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
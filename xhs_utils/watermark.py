@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+import time
+from xhs_utils.data_util import id_to_timestamp
+
+
+class WatermarkStore():
+    """
+        记录每个用户已经处理到的最新笔记，用于增量爬取
+        同时记录每篇笔记失败的次数，一直失败的笔记不会让水位永远停在它前面
+        :param path: SQLite 数据库文件
+        :param max_attempts: 笔记失败多少次后水位跳过它
+    """
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS watermarks ('
+            'user_id TEXT PRIMARY KEY, note_id TEXT NOT NULL, note_time INTEGER NOT NULL, updated INTEGER NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS failures ('
+            'user_id TEXT NOT NULL, note_id TEXT NOT NULL, attempts INTEGER NOT NULL, permanent INTEGER NOT NULL, '
+            'last_error TEXT, updated INTEGER NOT NULL, PRIMARY KEY (user_id, note_id))'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str):
+        """
+            :return: {'note_id', 'note_time'}，还没有爬取过时为 None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT note_id, note_time FROM watermarks WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        return {'note_id': row[0], 'note_time': row[1]}
+
+    def set(self, user_id: str, note_id: str):
+        # 只会往前推进，不会退回到更早的笔记
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO watermarks (user_id, note_id, note_time, updated) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET note_id = excluded.note_id, note_time = excluded.note_time, '
+                'updated = excluded.updated WHERE excluded.note_id > watermarks.note_id',
+                (user_id, note_id, id_to_timestamp(note_id), int(time.time())),
+            )
+            self._conn.commit()
+
+    def add_failure(self, user_id: str, note_id: str, error: str = '', permanent: bool = False):
+        """
+            记录笔记失败一次
+            :param error: 失败的原因
+            :param permanent: 是否为重试也不会成功的错误，如笔记已删除
+            :return: 累计失败次数，是否出现过不可重试的错误
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO failures (user_id, note_id, attempts, permanent, last_error, updated) VALUES (?, ?, 1, ?, ?, ?) '
+                'ON CONFLICT(user_id, note_id) DO UPDATE SET attempts = failures.attempts + 1, '
+                'permanent = max(failures.permanent, excluded.permanent), last_error = excluded.last_error, '
+                'updated = excluded.updated',
+                (user_id, note_id, int(permanent), error, int(time.time())),
+            )
+            self._conn.commit()
+            row = self._conn.execute('SELECT attempts, permanent FROM failures WHERE user_id = ? AND note_id = ?',
+                                     (user_id, note_id)).fetchone()
+        return row[0], bool(row[1])
+
+    def get_failures(self, user_id: str):
+        """
+            :return: {note_id: {'attempts', 'permanent', 'last_error'}}
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT note_id, attempts, permanent, last_error FROM failures WHERE user_id = ?',
+                                      (user_id,)).fetchall()
+        return {row[0]: {'attempts': row[1], 'permanent': bool(row[2]), 'last_error': row[3]} for row in rows}
+
+    def clear_failures(self, user_id: str, up_to: str):
+        # 水位已经越过的笔记不会再爬取，不用再记录失败次数
+        with self._lock:
+            self._conn.execute('DELETE FROM failures WHERE user_id = ? AND note_id <= ?', (user_id, up_to))
+            self._conn.commit()
+
+    def delete(self, user_id: str):
+        # 删除后下次会重新全量爬取
+        with self._lock:
+            self._conn.execute('DELETE FROM watermarks WHERE user_id = ?', (user_id,))
+            self._conn.execute('DELETE FROM failures WHERE user_id = ?', (user_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
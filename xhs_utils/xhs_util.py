@@ -1,18 +1,24 @@
 import json
 import math
+import os
 import random
-import execjs
+import re
+import threading
+import time
 from xhs_utils.cookie_util import trans_cookies
+from xhs_utils.sign_util import SignWorker, get_static_file
 
-try:
-    js = execjs.compile(open(r'../static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
+_xray_js = None
 
-try:
-    xray_js = execjs.compile(open(r'../static/xhs_xray.js', 'r', encoding='utf-8').read())
-except:
-    xray_js = execjs.compile(open(r'static/xhs_xray.js', 'r', encoding='utf-8').read())
+def get_xray_js():
+    # 第一次使用 JS 版 traceId 时才编译，cwd 设为脚本目录以便找到 xhs_xray_pack1/2.js
+    global _xray_js
+    if _xray_js is None:
+        import execjs
+        path = get_static_file('xhs_xray.js')
+        with open(path, 'r', encoding='utf-8') as f:
+            _xray_js = execjs.compile(f.read(), cwd=os.path.dirname(path))
+    return _xray_js
 
 def generate_x_b3_traceid(len=16):
     x_b3_traceid = ""
@@ -20,18 +26,99 @@ def generate_x_b3_traceid(len=16):
         x_b3_traceid += "abcdef0123456789"[math.floor(16 * random.random())]
     return x_b3_traceid
 
+_signer = None
+_signer_lock = threading.Lock()
+
+def get_signer():
+    # 整个进程共用一个签名器，默认是单个常驻签名进程，第一次签名时启动
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                _signer = SignWorker()
+    return _signer
+
+def set_signer(signer):
+    # 替换全局签名器，例如并发爬取时换成 SignerPool
+    global _signer
+    with _signer_lock:
+        _signer = signer
+
+def warmup(xray_js=False):
+    """
+        预先启动签名进程，常驻服务可以在开始处理请求前调用，避免第一个请求承担启动耗时
+        :param xray_js: 是否同时编译 JS 版 traceId 脚本，只有使用 JS 兜底时才需要
+    """
+    get_signer().start()
+    if xray_js:
+        get_xray_js()
+
 def generate_xs_xs_common(a1, api, data=''):
-    ret = js.call('get_request_headers_params', api, data, a1)
+    ret = get_signer().call('get_request_headers_params', api, data, a1)
     xs, xt, xs_common = ret['xs'], ret['xt'], ret['xs_common']
     return xs, xt, xs_common
 
 def generate_xs(a1, api, data=''):
-    ret = js.call('get_xs', api, data, a1)
+    ret = get_signer().call('get_xs', api, data, a1)
     xs, xt = ret['X-s'], ret['X-t']
     return xs, xt
 
-def generate_xray_traceid():
-    return xray_js.call('traceId')
+# x-xray-traceid 的 Python 实现，与 xhs_xray.js 中的 traceId 格式一致:
+# 16 位 hex(毫秒时间戳 << 23 | 23 位自增序号) + 16 位 hex(64 位随机数)
+XRAY_MAX_SEQ = 2 ** 23 - 1
+XRAY_TRACEID_RE = re.compile(r'^[0-9a-f]{32}$')
+_xray_seq = random.randint(0, XRAY_MAX_SEQ)
+_xray_seq_lock = threading.Lock()
+
+def generate_xray_traceid(use_js=False):
+    global _xray_seq
+    if use_js:
+        # 仅作为兜底，会重新解析近 4MB 的 xray 脚本
+        return get_xray_js().call('traceId')
+    with _xray_seq_lock:
+        if _xray_seq > XRAY_MAX_SEQ:
+            _xray_seq = 0
+        seq = _xray_seq
+        _xray_seq += 1
+    high = ((int(time.time() * 1000) << 23) | seq) & 0xFFFFFFFFFFFFFFFF
+    low = random.getrandbits(64)
+    return f'{high:016x}{low:016x}'
+
+def check_xray_traceid(trace_id, now_ms=None, tolerance_ms=60000):
+    """
+        校验 x-xray-traceid 的格式和其中的时间戳
+        :param trace_id: 待校验的 traceId
+        :param now_ms: 当前毫秒时间戳，默认为当前时间
+        :param tolerance_ms: 允许的时间戳误差（毫秒）
+        :return: 是否合法，说明
+    """
+    if not isinstance(trace_id, str) or not XRAY_TRACEID_RE.match(trace_id):
+        return False, f'格式错误: {trace_id}'
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    ts = int(trace_id[:16], 16) >> 23
+    if abs(ts - now_ms) > tolerance_ms:
+        return False, f'时间戳偏差过大: {ts}'
+    return True, 'success'
+
+def compare_xray_traceid(times=5):
+    """
+        差分测试：对比 Python 实现和 JS 实现生成的 traceId，二者格式和时间戳都应该一致
+        :param times: 对比次数
+        :return: 是否一致，不一致的说明列表
+    """
+    errors = []
+    for _ in range(times):
+        js_id = generate_xray_traceid(use_js=True)
+        py_id = generate_xray_traceid()
+        now_ms = int(time.time() * 1000)
+        for name, trace_id in [('js', js_id), ('py', py_id)]:
+            valid, msg = check_xray_traceid(trace_id, now_ms)
+            if not valid:
+                errors.append(f'{name} {msg}')
+        if not errors and abs((int(js_id[:16], 16) >> 23) - (int(py_id[:16], 16) >> 23)) > 60000:
+            errors.append(f'时间戳不一致: js {js_id} py {py_id}')
+    return len(errors) == 0, errors
 def get_common_headers():
     return {
         "authority": "www.xiaohongshu.com",
@@ -74,18 +161,40 @@ def get_request_headers_template():
         "x-xray-traceid": generate_xray_traceid()
     }
 
-def generate_headers(a1, api, data=''):
+def generate_sign_headers(a1, api, data=''):
+    # 只生成每次请求都会变化的签名头，其余固定的请求头由调用方复用
     xs, xt, xs_common = generate_xs_xs_common(a1, api, data)
-    x_b3_traceid = generate_x_b3_traceid()
-    headers = get_request_headers_template()
-    headers['x-s'] = xs
-    headers['x-t'] = str(xt)
-    headers['x-s-common'] = xs_common
-    headers['x-b3-traceid'] = x_b3_traceid
+    headers = {
+        "x-b3-traceid": generate_x_b3_traceid(),
+        "x-s": xs,
+        "x-s-common": xs_common,
+        "x-t": str(xt),
+        "x-xray-traceid": generate_xray_traceid(),
+    }
     if data:
         data = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
     return headers, data
 
+async def agenerate_sign_headers(a1, api, data=''):
+    # generate_sign_headers 的异步版本，签名在签名器的线程池中执行，不阻塞事件循环
+    ret = await get_signer().acall('get_request_headers_params', api, data, a1)
+    headers = {
+        "x-b3-traceid": generate_x_b3_traceid(),
+        "x-s": ret['xs'],
+        "x-s-common": ret['xs_common'],
+        "x-t": str(ret['xt']),
+        "x-xray-traceid": generate_xray_traceid(),
+    }
+    if data:
+        data = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return headers, data
+
+def generate_headers(a1, api, data=''):
+    sign_headers, data = generate_sign_headers(a1, api, data)
+    headers = get_request_headers_template()
+    headers.update(sign_headers)
+    return headers, data
+
 def generate_request_params(cookies_str, api, data=''):
     cookies = trans_cookies(cookies_str)
     a1 = cookies['a1']
@@ -100,3 +209,8 @@ def splice_str(api, params):
         url += key + '=' + value + '&'
     return url[:-1]
 
+
+if __name__ == '__main__':
+    # python -m xhs_utils.xhs_util 运行 traceId 差分测试
+    success, errors = compare_xray_traceid()
+    print(f'x-xray-traceid 差分测试: {success} {errors}')